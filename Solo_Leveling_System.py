@@ -1,8 +1,12 @@
 # --- Solo_Leveling_System.py (The Main Dashboard Page) ---
+# Each quest row is an st.fragment: logging a quest reruns only that row and
+# redraws the header metrics (through placeholders), not the whole page.
 
 import streamlit as st
 # Import all necessary components from our new core system!
-from core_system import  initialize_firebase, daily_reset_and_check, save_data, check_for_level_up ,QUESTS
+from core_system import  get_storage, daily_reset_and_check, save_data, check_for_level_up, get_catalog, log_quest, upgrade_stat, \
+    begin_rerun, end_rerun, flush_writes, commit_and_rerun, show_commit_counter, current_hunter_name, select_hunter, \
+    render_timer, show_render_timings
 
 
 # --- Solo_Leveling_System.py (Add this block near the top) ---
@@ -16,45 +20,16 @@ def apply_custom_css():
     except FileNotFoundError:
         st.error("Error: style.css not found in the project directory.")
 
-apply_custom_css()
-# --------------------------------------
+# --- HEADER (Rank / Level / Gold / XP, redrawn by the quest rows after a log) ---
+def render_header(slots):
+    """Fills the header placeholders with the hunter's current rank, level, gold and XP."""
+    hunter = st.session_state.hunter
+    slots['rank'].metric("Rank", hunter['rank'])
+    slots['level'].metric("Level", hunter['level'])
+    slots['gold'].metric("Gold (G)", hunter['gold'])
+    xp_percent = int((hunter['xp'] / hunter['xp_to_next_level']) * 100) if hunter['xp_to_next_level'] > 0 else 0
+    slots['xp'].progress(xp_percent, text=f"XP: {hunter['xp']} / {hunter['xp_to_next_level']}")
 
-# --- APP SETUP ---
-st.set_page_config(page_title="Solo Leveling System", layout="wide")
-initialize_firebase() # Initialize Firebase connection
-daily_reset_and_check() # Run daily login/reset logic
-
-hunter = st.session_state.hunter
-
-# --- UI DISPLAY: DASHBOARD ---
-st.title("SOLO LEVELING: THE HUNTER'S ASCENT")
-st.markdown("---")
-
-col1, col2, col3, col4 = st.columns(4)
-with col1:
-    st.text_input("Hunter Name", value=hunter['name'], disabled=True)
-with col2: st.metric("Rank", hunter['rank'])
-with col3: st.metric("Level", hunter['level'])
-with col4: st.metric("Gold (G)", hunter['gold'])
-
-xp_percent = int((hunter['xp'] / hunter['xp_to_next_level']) * 100) if hunter['xp_to_next_level'] > 0 else 0
-st.progress(xp_percent, text=f"XP: {hunter['xp']} / {hunter['xp_to_next_level']}")
-st.markdown("---")
-
-# --- STATS & UPGRADE ---
-def get_wil_status(wil):
-    if wil >= 7:
-        return "👑 Elite Discipline"
-    elif wil >= 5:
-        return "💪 Focused"
-    else:
-        return "😩 Temptation ↑"
-
-col1, col2 = st.columns(2)
-with col1:
-    st.subheader("Hunter Stats")
-    stats = hunter['stats']
-    
 # --- STATS & UPGRADE ---
 def get_wil_status(wil):
     if wil >= 7:
@@ -64,86 +39,113 @@ def get_wil_status(wil):
     else:
         return "😩 Temptation ↑"
 
-col1, col2 = st.columns(2)
-with col1:
-    st.subheader("Hunter Stats")
-    stats = hunter['stats']
-    
-    # NEW STAT DISPLAY with WIL Status
-    wil_status = get_wil_status(stats['wil'])
-    st.markdown(f"**💪 STR:** `{stats['str']}` **🧠 INT:** `{stats['intel']}` **💰 FIN:** `{stats['fin']}` **🤝 CHA:** `{stats['cha']}`")
-    st.markdown(f"**🧘 WIL:** `{stats['wil']}` — **Status:** **{wil_status}**")
-    
-    if hunter['skill_points'] > 0:
-        st.subheader(f"Skill Points to Allocate: {hunter['skill_points']}")
-        stat_to_upgrade = st.selectbox("Choose a stat to upgrade:", options=list(stats.keys()))
-        if st.button("Upgrade Stat"):
-            hunter['stats'][stat_to_upgrade] += 1
-            hunter['skill_points'] -= 1
-            save_data()
-            st.rerun()
-
-st.markdown("---")
+def render_stats():
+    hunter = st.session_state.hunter
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Hunter Stats")
+        stats = hunter['stats']
+
+        # NEW STAT DISPLAY with WIL Status
+        wil_status = get_wil_status(stats['wil'])
+        st.markdown(f"**💪 STR:** `{stats['str']}` **🧠 INT:** `{stats['intel']}` **💰 FIN:** `{stats['fin']}` **🤝 CHA:** `{stats['cha']}`")
+        st.markdown(f"**🧘 WIL:** `{stats['wil']}` — **Status:** **{wil_status}**")
+
+        if hunter['skill_points'] > 0:
+            st.subheader(f"Skill Points to Allocate: {hunter['skill_points']}")
+            stat_to_upgrade = st.selectbox("Choose a stat to upgrade:", options=list(stats.keys()))
+            if st.button("Upgrade Stat"):
+                upgrade_stat(stat_to_upgrade)
+                save_data()
+                commit_and_rerun()
 
 # --- DAILY QUESTS with TAB/BUTTON CHOICES ---
-st.header("Today's Quests")
-
 # Define the fixed percentage options
 PERCENTAGE_OPTIONS = [0, 30, 50, 70, 100]
 
-for key, quest in QUESTS.items():
-    is_completed = key in hunter['completed_daily_quests']
-    
-    quest_col, radio_col, button_col = st.columns([3, 2, 1])
-    
-    with quest_col:
-        # State to hold the current selected percentage
-        percentage_key = f"selected_percent_{key}"
-        if percentage_key not in st.session_state:
-            st.session_state[percentage_key] = 0
-
-        label = f"✅ {quest['name']}" if is_completed else quest['name']
-        mandatory = " `(MANDATORY)`" if quest.get("is_mandatory") else ""
-        st.markdown(f"**{label}**{mandatory}\n\n*Reward: +{quest['xp']} XP, +{quest['gold']} G*")
-
-    if not is_completed:
-        with radio_col:
-            # Use st.radio for the tab/button feel (horizontal layout)
-            st.session_state[percentage_key] = st.radio(
-                "Completion %",
-                options=PERCENTAGE_OPTIONS,
-                index=0, # Start at 0%
-                horizontal=True, # Makes it look like small tabs/buttons
-                key=f"radio_{key}", 
-                label_visibility="collapsed"
-            )
-
-        with button_col:
-            percentage = st.session_state[percentage_key]
-            
-            # The Log button is only enabled if the selected percentage is > 0
-            if st.button("Log Progress", key=key, use_container_width=True, disabled=(percentage == 0)):
-                
-                xp_gained = int(quest['xp'] * (percentage / 100))
-                gold_gained = int(quest['gold'] * (percentage / 100))
-                
-                hunter['xp'] += xp_gained
-                hunter['gold'] += gold_gained
-                
-                # Update stats
-                stat, points = quest['stat_bonus']
-                stat_gained = int(points * (percentage / 100))
-                if stat_gained > 0:
-                    hunter['stats'][stat] += stat_gained
-                    
-                # Mark as completed (even partial completion logs the effort)
-                hunter['completed_daily_quests'].append(key)
-                st.success(f"Logged {percentage}% for '{quest['name']}'. +{xp_gained} XP, +{gold_gained} G.")
-                
-                # Check for level up after gaining XP
-                check_for_level_up() # This function handles level up and saves data
-                
-                save_data()
-                st.rerun()
-                
+@st.fragment
+def quest_row(key, header_slots):
+    """One quest row. Logging reruns only this fragment; the header is redrawn on that rerun."""
+    with render_timer(f"quest:{key}"):
+        if st.session_state.pop('_refresh_header', False):
+            render_header(header_slots)
+
+        hunter = st.session_state.hunter
+        quests = get_catalog()
+        quest = quests[key]
+        is_completed = key in hunter['completed_daily_quests']
+
+        quest_col, radio_col, button_col = st.columns([3, 2, 1])
+
+        with quest_col:
+            label = f"✅ {quest['name']}" if is_completed else quest['name']
+            mandatory = " `(MANDATORY)`" if key in quests.mandatory else ""
+            st.markdown(f"**{label}**{mandatory}\n\n*Reward: +{quest['xp']} XP, +{quest['gold']} G*")
+
+        if not is_completed:
+            with radio_col:
+                # Use st.radio for the tab/button feel (horizontal layout)
+                percentage = st.radio(
+                    "Completion %",
+                    options=PERCENTAGE_OPTIONS,
+                    index=0, # Start at 0%
+                    horizontal=True, # Makes it look like small tabs/buttons
+                    key=f"radio_{key}",
+                    label_visibility="collapsed"
+                )
+
+            with button_col:
+                # The Log button is only enabled if the selected percentage is > 0
+                if st.button("Log Progress", key=key, width="stretch", disabled=(percentage == 0)):
+
+                    xp_gained, gold_gained = log_quest(key, percentage)
+                    st.toast(f"Logged {percentage}% for '{quest['name']}'. +{xp_gained} XP, +{gold_gained} G.")
+
+                    # A level-up changes the stats panel too, so it needs the full page
+                    levels_gained = check_for_level_up()
+
+                    save_data()
+                    st.session_state._refresh_header = True
+                    commit_and_rerun(scope="app" if levels_gained else "fragment") # One batched commit for this click
+
+        st.markdown("---")
+
+# --- APP SETUP ---
+st.set_page_config(page_title="Solo Leveling System", layout="wide")
+with render_timer("page"):
+    begin_rerun("Dashboard") # Start counting storage commits (and Diagnostics timings) for this rerun
+    apply_custom_css()
+    get_storage() # Connect to the configured storage backend
+
+    # Each browser session plays as one hunter (also selectable with ?hunter=<name> in the URL)
+    chosen_hunter = st.sidebar.text_input("Hunter", value=current_hunter_name()).strip()
+    if chosen_hunter and chosen_hunter != current_hunter_name():
+        select_hunter(chosen_hunter)
+        st.query_params["hunter"] = chosen_hunter
+    daily_reset_and_check() # Run daily login/reset logic
+
+    hunter = st.session_state.hunter
+    st.session_state.pop('_refresh_header', None) # A full run draws the header itself
+
+    # --- UI DISPLAY: DASHBOARD ---
+    st.title("SOLO LEVELING: THE HUNTER'S ASCENT")
+    st.markdown("---")
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.text_input("Hunter Name", value=hunter['name'], disabled=True)
+    header_slots = {'rank': col2.empty(), 'level': col3.empty(), 'gold': col4.empty(), 'xp': st.empty()}
+    render_header(header_slots)
     st.markdown("---")
+
+    render_stats()
+    st.markdown("---")
+
+    st.header("Today's Quests")
+    for key in get_catalog().daily_keys: # The weekly quest is awarded on the Forest Sync page, never logged here
+        quest_row(key, header_slots)
+
+    flush_writes() # Commit anything still staged by this rerun (e.g. the daily reset)
+show_commit_counter()
+show_render_timings()
+end_rerun()
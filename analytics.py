@@ -0,0 +1,145 @@
+# --- analytics.py ---
+# Whole-history analytics on NumPy arrays. A hunter's history subcollection is
+# packed once into day ordinals, a (days x quests) completion matrix and
+# end-of-day level / XP / gold columns. Every metric is then a handful of
+# array operations, with no per-day Python loop, so ten years of days takes
+# milliseconds.
+
+from datetime import date
+
+import numpy as np
+
+from leveling import LEVEL_CURVE
+from quest_registry import get_catalog
+
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class HistoryArrays:
+    """One hunter's history as parallel arrays, sorted by day (one row per stored history document)."""
+
+    def __init__(self, rows=(), catalog=None):
+        self.catalog = catalog or get_catalog()
+        self.days = np.empty(0, dtype=np.int32)                             # date.toordinal()
+        self.completed = np.zeros((0, self.catalog.total), dtype=bool)      # Columns follow catalog.ordinal
+        self.level = np.empty(0, dtype=np.int64)
+        self.xp = np.empty(0, dtype=np.int64)
+        self.gold = np.empty(0, dtype=np.int64)
+        self.extend(rows)
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def newest(self):
+        """ISO date of the newest row, or None."""
+        return date.fromordinal(int(self.days[-1])).isoformat() if len(self.days) else None
+
+    def extend(self, rows):
+        """Adds (date_str, history_doc) rows in ascending date order. Rows replace any stored day >= the first one."""
+        rows = list(rows)
+        if not rows:
+            return
+        ordinal = self.catalog.ordinal
+        n = len(rows)
+        days = np.empty(n, dtype=np.int32)
+        level = np.empty(n, dtype=np.int64)
+        xp = np.empty(n, dtype=np.int64)
+        gold = np.empty(n, dtype=np.int64)
+        hit_rows, hit_cols = [], []
+        # Unpacking the documents is the only per-row Python work; everything after it is vectorised
+        for i, (date_str, doc) in enumerate(rows):
+            days[i] = date.fromisoformat(date_str).toordinal()
+            level[i] = doc.get('level_at_day_end', 1)
+            xp[i] = doc.get('xp_at_day_end', 0)
+            gold[i] = doc.get('gold_at_day_end', 0)
+            cols = [ordinal[k] for k in set(doc.get('completed_quests', [])) if k in ordinal]
+            hit_rows.extend([i] * len(cols))
+            hit_cols.extend(cols)
+        completed = np.zeros((n, self.catalog.total), dtype=bool)
+        completed[hit_rows, hit_cols] = True
+
+        keep = self.days < days[0]
+        self.days = np.concatenate([self.days[keep], days])
+        self.completed = np.concatenate([self.completed[keep], completed])
+        self.level = np.concatenate([self.level[keep], level])
+        self.xp = np.concatenate([self.xp[keep], xp])
+        self.gold = np.concatenate([self.gold[keep], gold])
+
+
+def _rolling_mean(values, window):
+    """Trailing mean over `window` entries (fewer at the start of the series)."""
+    sums = np.cumsum(values, dtype=np.float64)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+def _run_lengths(ok):
+    """Length of the run of True values ending at each position."""
+    idx = np.arange(len(ok))
+    last_break = np.maximum.accumulate(np.where(ok, -1, idx))
+    return np.where(ok, idx - last_break, 0)
+
+
+def _velocity(series, window):
+    """Average change per day over the last `window` days of a dense daily series."""
+    if len(series) < 2:
+        return 0.0
+    window = min(window, len(series) - 1)
+    return float(series[-1] - series[-1 - window]) / window
+
+
+def compute_analytics(arrays, today=None):
+    """Streaks, rolling completion rates, XP / gold velocity and per-quest adherence.
+
+    Days with no history document count as days with nothing completed. If the
+    newest day is `today` (default: the real today) and its mandatory quests are
+    not all done yet, the current streak is still counted up to yesterday.
+    """
+    catalog = arrays.catalog
+    if not len(arrays):
+        return None
+
+    # Dense calendar: one slot per day from the first record to the last
+    first = int(arrays.days[0])
+    slot = arrays.days - first
+    n_days = int(slot[-1]) + 1
+    present = np.zeros(n_days, dtype=bool)
+    present[slot] = True
+    completed = np.zeros((n_days, catalog.total), dtype=bool)
+    completed[slot] = arrays.completed
+
+    daily_cols = np.array([catalog.ordinal[k] for k in catalog.daily_keys], dtype=np.intp)
+    mandatory_cols = np.array(sorted(catalog.ordinal[k] for k in catalog.mandatory), dtype=np.intp)
+    daily_rate = completed[:, daily_cols].sum(axis=1) / max(1, len(daily_cols))
+    mandatory_done = completed[:, mandatory_cols].all(axis=1) & present
+
+    # Streaks of days with every mandatory quest done
+    runs = _run_lengths(mandatory_done)
+    today_ordinal = (today or date.today()).toordinal()
+    in_progress = first + n_days - 1 == today_ordinal and not mandatory_done[-1]
+    current_streak = int(runs[-2]) if in_progress and n_days > 1 else int(runs[-1])
+
+    # End-of-day values carried forward over days with no record
+    carry = np.maximum.accumulate(np.where(present, np.arange(n_days), 0))
+    rows = np.searchsorted(arrays.days, first + carry)
+    lifetime_xp = LEVEL_CURVE.xp_to_reach(arrays.level) + arrays.xp
+    xp_series = lifetime_xp[rows]
+    gold_series = arrays.gold[rows]
+
+    adherence = completed[:, daily_cols].mean(axis=0)
+    return {
+        'dates': (np.arange(first, first + n_days) - UNIX_EPOCH_ORDINAL).astype('datetime64[D]'),
+        'daily_rate': daily_rate,
+        'rolling_7': _rolling_mean(daily_rate, 7),
+        'rolling_30': _rolling_mean(daily_rate, 30),
+        'current_streak': current_streak,
+        'best_streak': int(runs.max()),
+        'days_tracked': n_days,
+        'xp_per_day_7': _velocity(xp_series, 7),
+        'xp_per_day_30': _velocity(xp_series, 30),
+        'gold_per_day_7': _velocity(gold_series, 7),
+        'gold_per_day_30': _velocity(gold_series, 30),
+        'adherence': dict(zip(catalog.daily_keys, adherence.tolist())),
+    }
@@ -0,0 +1,60 @@
+# --- benchmarks/bench_analytics.py ---
+# Times the history analytics engine (analytics.py) for synthetic hunters with
+# 30 days to 10 years of history: packing the history documents into arrays
+# (cold load), appending one new day (warm load) and computing every metric.
+#
+# Usage: python benchmarks/bench_analytics.py [--days 30 365 3650] [--repeat 20] [--output file.json]
+
+import argparse
+import pathlib
+import sys
+import time
+
+sys.path.append(str(pathlib.Path(__file__).parent))
+from bench_utils import ROOT, seed_history, summarize_ms, write_results  # noqa: E402
+
+from analytics import HistoryArrays, compute_analytics  # noqa: E402
+from quest_registry import get_catalog  # noqa: E402
+from storage import MemoryStorage  # noqa: E402
+
+DEFAULT_DAYS = [30, 365, 3650]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize_ms(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the history analytics engine.")
+    parser.add_argument("--days", type=int, nargs="+", default=DEFAULT_DAYS, help="History sizes to test.")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per operation.")
+    parser.add_argument("--output", default=str(ROOT / "bench_results" / "analytics.json"))
+    args = parser.parse_args()
+
+    results = []
+    for days in args.days:
+        storage = MemoryStorage()
+        seed_history(storage, "Hunter", days, list(get_catalog().daily_keys))
+        rows = list(storage.stream_history("Hunter"))
+        arrays = HistoryArrays(rows)
+
+        ops = {
+            "pack_arrays": lambda: HistoryArrays(rows),
+            "append_day": lambda: arrays.extend(rows[-1:]),
+            "compute": lambda: compute_analytics(arrays),
+        }
+        for op, fn in ops.items():
+            row = {"days": days, "op": op, **timed(fn, args.repeat)}
+            results.append(row)
+            print(f"{days:>6} days  {op:<12} median {row['median_ms']:>9.3f} ms  p95 {row['p95_ms']:>9.3f} ms")
+
+    write_results(args.output, "analytics", results, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# --- benchmarks/bench_contention.py ---
+# Several sessions writing the same hunter at once. Each session is a thread that
+# keeps its own (possibly stale) copy of the hunter, like a browser tab does, and
+# commits its actions through ledger.commit_events() with the writes built by
+# core_system.commit_builder(), as flush_writes() does: create-only event appends,
+# rebase + retry when another session got there first. Reports how often commits
+# had to retry and checks that no update was lost (final gold, XP and rollup
+# counts must equal what all sessions committed). Actions whose commit still
+# conflicted after MAX_COMMIT_ATTEMPTS are dropped, as flush_writes() drops
+# them with a warning; they are reported as not saved.
+#
+# Usage: python benchmarks/bench_contention.py [--sessions 1 2 4 8] [--actions 200]
+#                                              [--think-ms 0] [--backend memory sqlite] [--output file.json]
+
+import argparse
+import copy
+import pathlib
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.append(str(pathlib.Path(__file__).parent))
+from bench_utils import ROOT, new_hunter, summarize_ms, write_results  # noqa: E402
+
+import core_system  # noqa: E402
+import ledger  # noqa: E402
+import rollups  # noqa: E402
+from storage import MemoryStorage, SQLiteStorage, WriteConflict  # noqa: E402
+
+HUNTER = "Hunter"
+QUEST = "bench_quest"  # Logged as a non-daily quest, so concurrent logs never dedupe each other
+
+
+def make_storage(backend, tmpdir):
+    storage = MemoryStorage() if backend == "memory" else SQLiteStorage(str(pathlib.Path(tmpdir) / "contention.db"))
+    hunter = new_hunter(HUNTER)
+    hunter["ledger_seq"] = 0
+    storage.batch().set_hunter(HUNTER, hunter).commit()
+    return storage
+
+
+def session(storage, actions, think_s, seed, stats, lock):
+    rng = random.Random(seed)
+    state = ledger.load_hunter(storage, HUNTER)
+    latencies, retries, exhausted = [], 0, 0
+    for _ in range(actions):
+        base = copy.deepcopy(state)
+        event = ledger.new_event(state["ledger_seq"] + 1, "quest_logged", quest=QUEST, percentage=100,
+                                 xp=1, gold=1, stat="str", points=0, daily=False)
+        ledger.apply_event(state, event)
+        build = core_system.commit_builder(HUNTER, base, {}, write_snapshot=True)  # A quest log stages the hunter
+        started = time.perf_counter()
+        try:
+            state, _, attempt_retries = ledger.commit_events(storage, HUNTER, state, base, [event], build)
+        except WriteConflict:
+            exhausted += 1
+            state = ledger.load_hunter(storage, HUNTER)
+            continue
+        latencies.append(time.perf_counter() - started)
+        retries += attempt_retries
+        if think_s:
+            time.sleep(rng.uniform(0, 2 * think_s))
+    with lock:
+        stats["latencies"].extend(latencies)
+        stats["retries"] += retries
+        stats["exhausted"] += exhausted
+
+
+def run(backend, sessions, actions, think_ms):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = make_storage(backend, tmpdir)
+        stats, lock = {"latencies": [], "retries": 0, "exhausted": 0}, threading.Lock()
+        threads = [threading.Thread(target=session, args=(storage, actions, think_ms / 1000, i, stats, lock))
+                   for i in range(sessions)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        final = ledger.load_hunter(storage, HUNTER)
+        committed = len(stats["latencies"])
+        week_id, _ = rollups.week_doc(date.today())
+        week = storage.get_doc(HUNTER, rollups.ROLLUP_COLLECTION, week_id) or {}
+        return {
+            "backend": backend, "sessions": sessions, "actions_per_session": actions, "think_ms": think_ms,
+            "commits": committed, "retries": stats["retries"],
+            "retry_rate": round(stats["retries"] / committed, 4) if committed else 0.0,
+            "exhausted": stats["exhausted"],
+            # Every attempted action is either in the final state or was reported as not saved
+            "not_saved": sessions * actions - final["gold"],
+            # Every committed action must be in the final state and in the rollup, exactly once
+            "lost_updates": committed - final["gold"],
+            "rollup_mismatch": committed - week.get("quests_completed", 0),
+            "ledger_seq": final["ledger_seq"],
+            "commits_per_s": round(committed / elapsed, 1),
+            **summarize_ms(stats["latencies"]),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent sessions writing one hunter.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--actions", type=int, default=200, help="Actions (commits) per session.")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Mean pause between a session's actions.")
+    parser.add_argument("--backend", nargs="+", default=["memory", "sqlite"], choices=("memory", "sqlite"))
+    parser.add_argument("--output", default=str(ROOT / "bench_results" / "contention.json"))
+    args = parser.parse_args()
+
+    results = [run(backend, sessions, args.actions, args.think_ms)
+               for backend in args.backend for sessions in args.sessions]
+    for row in results:
+        print(f"{row['backend']:<7} {row['sessions']:>3} sessions  {row['commits']:>6} commits  "
+              f"retry rate {row['retry_rate']:>6.3f}  not saved {row['not_saved']}  lost {row['lost_updates']}  "
+              f"p50 {row['median_ms']:>7.2f} ms  p95 {row['p95_ms']:>7.2f} ms  {row['commits_per_s']:>8.1f} commits/s")
+    write_results(args.output, "contention", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# --- benchmarks/bench_eod_fanout.py ---
+# Runs notifier.run_eod_pipeline() for many synthetic hunters against a local
+# HTTP stand-in for ntfy (no real notifications are sent). The stand-in can add
+# latency per request, so the effect of the worker pool and the rate limit shows.
+#
+# Usage: python benchmarks/bench_eod_fanout.py [--hunters 10 100 1000] [--workers 1 8 32]
+#                                              [--latency-ms 50] [--rate 0] [--output file.json]
+
+import argparse
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(str(pathlib.Path(__file__).parent))
+from bench_utils import ROOT, CountingStorage, new_hunter, write_results  # noqa: E402
+
+import notifier  # noqa: E402
+from outbox import Outbox  # noqa: E402
+from storage import MemoryStorage  # noqa: E402
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Accepts ntfy-style POST /<topic>, optionally after a fixed delay."""
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection pooling is exercised
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    latency_s = 0.0
+    received = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency_s)
+        with self.lock:
+            type(self).received += 1
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stand_in(latency_ms):
+    StandInHandler.latency_s = latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def seed_hunters(count):
+    storage = CountingStorage(MemoryStorage())
+    batch = storage.inner.batch()
+    for i in range(count):
+        hunter = new_hunter(f"Hunter-{i:05d}")
+        hunter.update({"eod_channel": "ntfy", "ntfy_topic": f"bench-{i:05d}", "completed_daily_quests": ["wake_early"]})
+        batch.set_hunter(hunter["name"], hunter)
+    batch.commit()
+    return storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the concurrent EOD report pipeline.")
+    parser.add_argument("--hunters", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Delay the stand-in adds per request.")
+    parser.add_argument("--rate", type=float, default=0.0, help="Sends per second (0 = unlimited).")
+    parser.add_argument("--output", default=str(ROOT / "bench_results" / "eod_fanout.json"))
+    args = parser.parse_args()
+
+    server = start_stand_in(args.latency_ms)
+    notifier.NTFY_SERVER = f"http://127.0.0.1:{server.server_address[1]}"
+    results = []
+    try:
+        for count in args.hunters:
+            storage = seed_hunters(count)
+            for workers in args.workers:
+                storage.reset_counters()
+                StandInHandler.received = 0
+                with tempfile.TemporaryDirectory() as tmpdir:  # A fresh outbox, so no report is deduplicated away
+                    summary = notifier.run_eod_pipeline(storage, max_workers=workers, rate_limit=args.rate,
+                                                        outbox=Outbox(str(pathlib.Path(tmpdir) / "outbox.db")))
+                row = {"hunters": count, "workers": workers, "rate_limit": args.rate,
+                       "latency_ms": args.latency_ms, "received": StandInHandler.received,
+                       **summary, **{f"storage_{k}": v for k, v in storage.counters().items()}}
+                results.append(row)
+    finally:
+        server.shutdown()
+
+    for row in results:
+        print(f"{row['hunters']:>6} hunters  {row['workers']:>3} workers  total {row['total_s']:>8.3f} s  "
+              f"p50 {row['send_p50_ms']:>7.1f} ms  p99 {row['send_p99_ms']:>7.1f} ms  "
+              f"sent {row['sent']}/{row['reports']}  storage reads {row['storage_reads']}")
+    write_results(args.output, "eod_fanout", results)
+
+
+if __name__ == "__main__":
+    main()
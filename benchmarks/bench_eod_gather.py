@@ -0,0 +1,184 @@
+# --- benchmarks/bench_eod_gather.py ---
+# The data-gathering stage of the EOD report for thousands of hunters:
+# notifier.gather_eod_data() (a get_hunters() plus one get_docs() for every
+# hunter's history day, week rollup and next ledger event, in GET_ALL_CHUNK
+# chunks) against the per-hunter reads it replaces (ledger catch-up plus a
+# rollup get for each hunter, 2 x N round trips). Both must render identical
+# reports. --rtt-ms adds a fixed delay per round trip, like a network backend.
+#
+# Hunters are seeded the way the game writes them: a snapshot, ledger events
+# after it, today's history day and the week rollup. Most played today, some
+# are idle, and a few have unsnapshotted events but no activity today (the
+# gather's second get over the snapshot window).
+#
+# Usage: python benchmarks/bench_eod_gather.py [--hunters 100 1000 5000] [--backend memory sqlite]
+#                                              [--rtt-ms 0] [--output file.json]
+
+import argparse
+import copy
+import pathlib
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.append(str(pathlib.Path(__file__).parent))
+from bench_utils import ROOT, CountingStorage, new_hunter, write_results  # noqa: E402
+
+import ledger  # noqa: E402
+import notifier  # noqa: E402
+import rollups  # noqa: E402
+from quest_registry import get_catalog  # noqa: E402
+from storage import MemoryStorage, SQLiteStorage  # noqa: E402
+
+
+class DelayedStorage(CountingStorage):
+    """Counts round trips and sleeps `rtt_s` for each read one."""
+
+    def __init__(self, inner, rtt_s):
+        super().__init__(inner)
+        self.rtt_s = rtt_s
+
+    def _read(self, method, *args, **kwargs):
+        before = self.reads
+        result = getattr(super(), method)(*args, **kwargs)
+        if self.rtt_s:
+            time.sleep(self.rtt_s * (self.reads - before))
+        return result
+
+    def get_hunters(self, names):
+        return self._read("get_hunters", names)
+
+    def get_doc(self, name, collection, doc_id):
+        return self._read("get_doc", name, collection, doc_id)
+
+    def get_docs(self, keys):
+        return self._read("get_docs", keys)
+
+    def stream_docs(self, name, collection, **query):
+        return self._read("stream_docs", name, collection, **query)
+
+
+def seed_hunter(batch, name, kind, rng, daily_keys):
+    """Writes one hunter's snapshot, events after it, today's history and the week rollup."""
+    today = date.today()
+    yesterday = (today - timedelta(days=1)).isoformat()
+    snapshot = new_hunter(name, last_login=yesterday)
+    snapshot.update({"ledger_seq": rng.randint(0, 200), "level": rng.randint(1, 20), "gold": rng.randint(0, 500),
+                     "completed_daily_quests": rng.sample(daily_keys, 2),
+                     "eod_channel": "ntfy", "ntfy_topic": f"bench-{name}"})
+    if kind == "idle":
+        batch.set_hunter(name, snapshot)
+        return
+    state = copy.deepcopy(snapshot)
+    events = []
+
+    def append(event_type, **data):
+        event = ledger.new_event(state["ledger_seq"] + 1, event_type, **data)
+        ledger.apply_event(state, event)
+        events.append(event)
+
+    if kind == "active":
+        append("day_closed", date=yesterday, completed_quests=list(state["completed_daily_quests"]),
+               gold_at_day_end=state["gold"], xp_at_day_end=state["xp"], level_at_day_end=state["level"],
+               missed=[], skipped=False)
+        append("patch", set={"last_login": today.isoformat(), "completed_daily_quests": []}, unset=[])
+    for quest in rng.sample(daily_keys, rng.randint(1, len(daily_keys))):
+        append("quest_logged", quest=quest, percentage=100, xp=rng.randint(100, 900), gold=rng.randint(1, 20),
+               stat="str", points=0, daily=True)
+        if fields := ledger.level_up_fields(state):
+            append("level_up", **fields)
+    # One commit, like flush_writes(): the snapshot is rewritten if it crossed a multiple of SNAPSHOT_EVERY
+    crossed = state["ledger_seq"] // ledger.SNAPSHOT_EVERY > snapshot["ledger_seq"] // ledger.SNAPSHOT_EVERY
+    batch.set_hunter(name, state if crossed else snapshot)
+    docs = {}
+    for event in events:
+        batch.create_doc(name, ledger.EVENTS_COLLECTION, ledger.event_id(event["seq"]), event)
+        for doc_id, header, fields in rollups.event_increments(event):
+            rollups.add_fields(docs.setdefault(doc_id, dict(header)), fields)
+    for doc_id, data in docs.items():
+        batch.set_doc(name, rollups.ROLLUP_COLLECTION, doc_id, data)
+    if kind == "active":  # What core_system.flush_writes() leaves in today's history day
+        batch.set_history(name, today.isoformat(), {
+            "completed_quests": list(state["completed_daily_quests"]), "gold_at_day_end": state["gold"],
+            "xp_at_day_end": state["xp"], "level_at_day_end": state["level"]})
+
+
+def seed(storage, count, seed=0):
+    rng = random.Random(seed)
+    daily_keys = list(get_catalog().daily_keys)
+    names = [f"Hunter-{i:05d}" for i in range(count)]
+    batch = storage.batch()
+    for name in names:
+        kind = rng.choices(("active", "idle", "stale"), weights=(7, 2, 1))[0]
+        seed_hunter(batch, name, kind, rng, daily_keys)
+        if len(batch) >= 400:
+            batch.commit()
+            batch = storage.batch()
+    batch.commit()
+    return names
+
+
+def per_hunter(storage, names, report_date):
+    """The reads run_eod_pipeline() used to make: catch up each hunter's ledger, then get its week rollup."""
+    week_doc = rollups.week_id(date.fromisoformat(report_date))
+    gathered = {}
+    for name, hunter_data in storage.get_hunters(names).items():
+        hunter_data = ledger.catch_up(storage, name, hunter_data)
+        if hunter_data.get("last_login") != report_date:
+            hunter_data["completed_daily_quests"] = []
+        gathered[name] = (hunter_data, storage.get_doc(name, rollups.ROLLUP_COLLECTION, week_doc))
+    return gathered
+
+
+def measure(storage, label, gather):
+    storage.reset_counters()
+    started = time.perf_counter()
+    gathered = gather()
+    elapsed = time.perf_counter() - started
+    return gathered, {f"{label}_s": round(elapsed, 4), f"{label}_reads": storage.reads,
+                      f"{label}_docs_read": storage.docs_read}
+
+
+def run(backend, count, rtt_ms):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        inner = MemoryStorage() if backend == "memory" else SQLiteStorage(str(pathlib.Path(tmpdir) / "gather.db"))
+        names = seed(inner, count)
+        storage = DelayedStorage(inner, rtt_ms / 1000)
+        report_date = date.today().isoformat()
+
+        baseline, row = measure(storage, "per_hunter", lambda: per_hunter(storage, names, report_date))
+        batched, batched_row = measure(storage, "batched",
+                                       lambda: notifier.gather_eod_data(storage, names, report_date))
+        batched, fallbacks = batched
+        row.update(batched_row)
+
+        def report(found):
+            return notifier.build_eod_report(found[0], report_date, found[1])
+
+        mismatches = sum(report(baseline[name]) != report(batched[name]) for name in names)
+        return {"backend": backend, "hunters": count, "rtt_ms": rtt_ms, **row, "fallbacks": fallbacks,
+                "mismatches": mismatches,
+                "speedup": round(row["per_hunter_s"] / row["batched_s"], 1) if row["batched_s"] else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched EOD data gathering.")
+    parser.add_argument("--hunters", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--backend", nargs="+", default=["memory", "sqlite"], choices=("memory", "sqlite"))
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="Delay added per read round trip.")
+    parser.add_argument("--output", default=str(ROOT / "bench_results" / "eod_gather.json"))
+    args = parser.parse_args()
+
+    results = [run(backend, count, args.rtt_ms) for backend in args.backend for count in args.hunters]
+    for row in results:
+        print(f"{row['backend']:<7} {row['hunters']:>6} hunters  "
+              f"per-hunter {row['per_hunter_reads']:>6} reads {row['per_hunter_s']:>8.3f} s  "
+              f"batched {row['batched_reads']:>4} reads {row['batched_s']:>8.3f} s  "
+              f"x{row['speedup']:<6} fallbacks {row['fallbacks']}  mismatches {row['mismatches']}")
+    write_results(args.output, "eod_gather", results)
+
+
+if __name__ == "__main__":
+    main()
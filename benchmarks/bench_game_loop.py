@@ -0,0 +1,150 @@
+# --- benchmarks/bench_game_loop.py ---
+# Benchmarks the core game loop against an in-memory backend, for synthetic
+# hunters with 1 to 10,000 days of history:
+#   daily_reset_and_check() (no-op, day rollover and a 30-day catch-up), quest logging,
+#   check_for_level_up() and load_history_data() (cold and warm cache).
+#
+# For every operation it reports wall time, storage round trips and documents
+# per operation, bytes written and peak traced memory, and writes everything to
+# a JSON file so runs can be diffed between commits.
+#
+# Usage: python benchmarks/bench_game_loop.py [--days 1 10 100] [--repeat 20] [--output file.json]
+
+import argparse
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent))
+from bench_utils import ROOT, write_results  # noqa: E402
+
+DEFAULT_DAYS = [1, 10, 100, 1000, 10000]
+
+
+def _bench_script():
+    # Runs as a Streamlit script (through AppTest) so st.session_state behaves exactly as in the app.
+    import time
+    import tracemalloc
+    from datetime import date, timedelta
+    import streamlit as st
+    import core_system
+    from bench_utils import CountingStorage, seed_history, summarize_ms
+    from storage import MemoryStorage
+
+    config = st.session_state.bench_config
+    days, repeat = config["days"], config["repeat"]
+    results = []
+
+    storage = CountingStorage(MemoryStorage())
+    seed_history(storage.inner, "Hunter", days, list(core_system.get_catalog().daily_keys))  # Seeding is not counted
+    core_system.use_storage(storage)
+    core_system.invalidate_hunter_cache("Hunter")
+    core_system.invalidate_reset_gate("Hunter")
+    for key in ("hunter", "_pending_writes", "_history_cache", "_history_days"):
+        st.session_state.pop(key, None)
+    core_system.initialize_state()
+    hunter = st.session_state.hunter
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    month_ago = (date.today() - timedelta(days=30)).isoformat()
+
+    def run_once(setup, action):
+        setup()
+        core_system.flush_writes()  # Setup writes are not part of the measurement
+        storage.reset_counters()
+        start = time.perf_counter()
+        action()
+        return time.perf_counter() - start
+
+    def measure(op, setup, action):
+        samples, counters = [], []
+        for _ in range(repeat):
+            samples.append(run_once(setup, action))
+            counters.append(storage.counters())
+        # One extra traced run for peak memory (tracemalloc would distort the timings above)
+        tracemalloc.start()
+        run_once(setup, action)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        row = {"days": days, "op": op, **summarize_ms(samples), "peak_kib": round(peak / 1024, 1)}
+        for key in counters[0]:
+            row[f"{key}_per_op"] = sum(c[key] for c in counters) / len(counters)
+        results.append(row)
+
+    def nothing():
+        pass
+
+    def roll_back_a_day():
+        hunter["last_login"] = yesterday
+        core_system.invalidate_reset_gate("Hunter")  # As if the date had just changed
+
+    def come_back_after_a_month():
+        hunter["last_login"] = month_ago
+        hunter["gold"] = 1000  # Enough that every skipped day's penalty applies
+        core_system.invalidate_reset_gate("Hunter")
+
+    def rollover():
+        core_system.daily_reset_and_check()
+        core_system.flush_writes()
+
+    def fresh_quest_day():
+        hunter["completed_daily_quests"] = []
+        hunter["xp"] = 0
+
+    def log_one_quest():
+        core_system.log_quest("ai_course_1", 100)
+        core_system.check_for_level_up()
+        core_system.save_data()
+        core_system.flush_writes()
+
+    def enough_xp_for_three_levels():
+        hunter.update(level=1, xp=0, xp_to_next_level=1000)
+        hunter["xp"] = 1000 + 2828 + 5196  # Levels 1 -> 4 in a single grant
+
+    def level_up():
+        core_system.check_for_level_up()
+        core_system.flush_writes()
+
+    def drop_history_cache():
+        st.session_state.pop("_history_cache", None)
+        st.session_state.pop("_history_days", None)
+
+    measure("daily_reset_noop", nothing, core_system.daily_reset_and_check)
+    measure("daily_reset_rollover", roll_back_a_day, rollover)
+    measure("daily_reset_catchup_30d", come_back_after_a_month, rollover)
+    measure("log_quest", fresh_quest_day, log_one_quest)
+    measure("level_up", enough_xp_for_three_levels, level_up)
+    measure("load_history_cold", drop_history_cache, lambda: core_system.load_history_data(limit=30))
+    measure("load_history_warm", nothing, lambda: core_system.load_history_data(limit=30))
+
+    core_system.use_storage(None)
+    st.session_state.bench_results = results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Solo Leveling game loop.")
+    parser.add_argument("--days", type=int, nargs="+", default=DEFAULT_DAYS, help="History sizes to test.")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per operation.")
+    parser.add_argument("--output", default=str(ROOT / "bench_results" / "game_loop.json"))
+    args = parser.parse_args()
+
+    from streamlit.testing.v1 import AppTest
+
+    results = []
+    for days in args.days:
+        app = AppTest.from_function(_bench_script, default_timeout=600)
+        app.session_state["bench_config"] = {"days": days, "repeat": args.repeat}
+        app.run()
+        if app.exception:
+            raise SystemExit(f"Benchmark failed for {days} days: {app.exception}")
+        for row in app.session_state["bench_results"]:
+            results.append(row)
+            print(f"{row['days']:>6} days  {row['op']:<24} median {row['median_ms']:>9.3f} ms  "
+                  f"p95 {row['p95_ms']:>9.3f} ms  reads {row['reads_per_op']:>5.1f}  "
+                  f"commits {row['commits_per_op']:>4.1f}  bytes {row['bytes_written_per_op']:>8.0f}  "
+                  f"peak {row['peak_kib']:>8.1f} KiB")
+
+    write_results(args.output, "game_loop", results, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
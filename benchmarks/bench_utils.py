@@ -0,0 +1,152 @@
+# --- benchmarks/bench_utils.py ---
+# Shared helpers for the benchmark scripts: a call-counting storage wrapper,
+# synthetic hunters, timing/percentile helpers and the JSON results writer.
+
+import json
+import os
+import pathlib
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.append(str(ROOT))  # So the benchmarks can import the app modules
+
+from storage import GET_ALL_CHUNK, StorageBackend  # noqa: E402
+
+
+class CountingStorage(StorageBackend):
+    """Wraps a backend and counts storage round trips, documents and bytes written."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.reads = 0        # read round trips (get / query)
+        self.docs_read = 0
+        self.commits = 0      # write round trips
+        self.writes = 0       # individual document writes
+        self.bytes_written = 0
+
+    def counters(self):
+        return {"reads": self.reads, "docs_read": self.docs_read, "commits": self.commits,
+                "writes": self.writes, "bytes_written": self.bytes_written}
+
+    def get_hunter(self, name):
+        self.reads += 1
+        self.docs_read += 1
+        return self.inner.get_hunter(name)
+
+    def list_hunters(self):
+        self.reads += 1
+        return self.inner.list_hunters()
+
+    def get_hunters(self, names):
+        found = self.inner.get_hunters(names)
+        self.reads += -(-len(found) // GET_ALL_CHUNK) or 1  # One round trip per GET_ALL_CHUNK documents
+        self.docs_read += len(found)
+        return found
+
+    def get_doc(self, name, collection, doc_id):
+        self.reads += 1
+        self.docs_read += 1
+        return self.inner.get_doc(name, collection, doc_id)
+
+    def get_docs(self, keys):
+        found = self.inner.get_docs(keys)
+        self.reads += -(-len(found) // GET_ALL_CHUNK) or 1
+        self.docs_read += len(found)
+        return found
+
+    def stream_docs(self, name, collection, **query):
+        self.reads += 1
+        docs = list(self.inner.stream_docs(name, collection, **query))
+        self.docs_read += len(docs)
+        return iter(docs)
+
+    def _commit(self, ops):
+        self.commits += 1
+        self.writes += len(ops)
+        self.bytes_written += sum(len(json.dumps(op[4], default=repr)) for op in ops)
+        self.inner._commit(ops)
+
+
+def new_hunter(name="Hunter", last_login=None):
+    """A fresh hunter document, shaped like core_system.initialize_state() creates."""
+    return {
+        "name": name, "rank": "E-Rank", "level": 1, "xp": 0,
+        "xp_to_next_level": 1000, "gold": 0, "skill_points": 0,
+        "stats": {"str": 5, "intel": 5, "wil": 5, "fin": 5, "cha": 5},
+        "last_login": last_login or date.today().isoformat(),
+        "completed_daily_quests": [],
+        "daily_limits": {"instagram_mins": 30, "youtube_mins": 45},
+        "eod_report_submitted_today": False,
+    }
+
+
+def seed_history(storage, name, days, quest_keys, seed=0):
+    """Writes `days` synthetic history documents ending yesterday, in batches. Returns the hunter doc."""
+    rng = random.Random(seed)
+    hunter = new_hunter(name)
+    start = date.today() - timedelta(days=days)
+    batch = storage.batch()
+    for offset in range(days):
+        done = rng.sample(quest_keys, rng.randint(0, len(quest_keys)))
+        hunter["gold"] += 3 * len(done)
+        hunter["xp"] += 50 * len(done)
+        batch.set_history(name, (start + timedelta(days=offset)).isoformat(), {
+            "completed_quests": done,
+            "gold_at_day_end": hunter["gold"],
+            "xp_at_day_end": hunter["xp"],
+            "level_at_day_end": hunter["level"],
+        })
+        if len(batch) >= 500:
+            batch.commit()
+    batch.set_hunter(name, hunter)
+    batch.commit()
+    return hunter
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize_ms(samples_s):
+    """Median / p95 / max of a list of durations in seconds, reported in milliseconds."""
+    ms = [s * 1000 for s in samples_s]
+    return {"median_ms": round(percentile(ms, 50), 4), "p95_ms": round(percentile(ms, 95), 4),
+            "max_ms": round(max(ms), 4) if ms else 0.0, "runs": len(ms)}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def write_results(path, benchmark, results, **extra):
+    """Writes one machine-readable results file: metadata plus a list of result rows."""
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "benchmark": benchmark,
+        "git_commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **extra,
+        "results": results,
+    }
+    path.write_text(json.dumps(payload, indent=2))
+    print(f"Results written to {os.path.relpath(path)}")
+    return payload
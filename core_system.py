@@ -1,117 +1,54 @@
 # --- core_system.py ---
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import date, timedelta
 import firebase_admin
 from firebase_admin import credentials, firestore
 import pandas as pd 
+from hunter_state import TrackedHunter, diff_fields
+from analytics import HistoryArrays, compute_analytics
+from forest_import import parse_forest_export
+from leveling import BASE_XP, SKILL_POINTS_PER_LEVEL
+from quest_registry import get_catalog
+from instrumentation import InstrumentedStorage, instrumented
+import instrumentation
+import ledger
+import rollups
+from storage import create_storage, DELETE, FIRESTORE_BATCH_LIMIT, WriteConflict
 
 # --- 1. CONFIG: GAME CONSTANTS ---
-BASE_XP = 1000
-XP_MULTIPLIER = 1.5
-QUESTS  = {
-    # 🌅 Morning Rituals
-    "wake_early": {
-        "name": "Wake Up by 6:00 AM (Rise & Shine)",
-        "xp": 40,
-        "gold": 4,
-        "stat_bonus": ("wil", 1),
-        "is_mandatory": True
-    },
-    "gym_morning": {
-        "name": "Gym Workout (7:00–8:30 AM)",
-        "xp": 150,
-        "gold": 15,
-        "stat_bonus": ("str", 2)
-    },
-    "meditation": {
-        "name": "Meditate for 5–10 Minutes",
-        "xp": 30,
-        "gold": 3,
-        "stat_bonus": ("intel", 1)
-    },
-    "breakfast_1": {
-        "name": "Eat Proper Breakfast (Protein + Fiber)",
-        "xp": 35,
-        "gold": 3,
-        "stat_bonus": ("str", 1)
-    },
-
-    # 💻 Work Quests   Ardhamayyela Hustle
-    "server_check": {
-        "name": "Daily System Check (Servers @ 9 AM)",
-        "xp": 20,
-        "gold": 2,
-        "stat_bonus": ("wil", 1)
-    },
-    "ai_course_1": {
-        "name": "AI Course Study (10-11 AM)",
-        "xp": 200,
-        "gold": 20,
-        "stat_bonus": ("intel", 2),
-        "is_mandatory": True
-    },
-    "tickets": {
-        "name": "Resolve Assigned Tickets (11-12 PM)",
-        "xp": 100,
-        "gold": 10,
-        "stat_bonus": ("intel", 1)
-    },
-    "breakfast_2": {
-        "name": "Eat Healthy Lunch",
-        "xp": 35,
-        "gold": 3,
-        "stat_bonus": ("str", 1)
-    },
-    "hydration": {
-        "name": "Drink 3-4 Liters of Water",
-        "xp": 25,
-        "gold": 2,
-        "stat_bonus": ("str", 1)
-    },
-    "ai_course_2": {
-        "name": "AI Course Study (4-5 PM)",
-        "xp": 200,
-        "gold": 20,
-        "stat_bonus": ("intel", 2)
-    },
-    
-    # --- NEW WEEKLY FOCUS QUEST ---
-    "deep_focus_weekly": {
-        "name": "Deep Focus (Weekly Target: 8+ Hours Logged via Forest)",
-        "xp": 1000,
-        "gold": 100,
-        "stat_bonus": ("intel", 5),
-        "is_weekly": True
-    },
-
-    # 🌙 Evening Rituals
-    "walk_night": {
-        "name": "Night Walk (9–10 PM)",
-        "xp": 50,
-        "gold": 5,
-        "stat_bonus": ("wil", 1)
-    },
-    "standup": {
-        "name": "Daily Progress Report (Stand-up @ 8:30 PM)",
-        "xp": 30,
-        "gold": 3,
-        "stat_bonus": ("cha", 1),
-        "is_mandatory": True
-    }
-    
-}
+# (The XP curve, BASE_XP and XP_MULTIPLIER, lives in leveling.py; quest definitions in quests.json, see quest_registry.py)
 STORE_ITEMS = {
     "insta": {"name": "15 Min of 🅾  𝐈𝐧𝐬𝐭𝐚𝐠𝐫𝐚𝐦 ", "cost": 15},
     "tv": {"name": "1 Episode of a TV Show 📺", "cost": 30},
     "junk": {"name": "Order Junk Food 🍔", "cost": 100},
     "yt": {"name": "30 Mins YouTube ▶️", "cost": 25}
 }
+DEFAULT_HUNTER = "Hunter" # Used when a session doesn't pick a hunter (no ?hunter= in the URL)
+NEW_HUNTER_LOGIN = "2000-01-01" # last_login of a hunter that has never played (no days to close)
+MISSED_MANDATORY_PENALTY = 20 # Gold lost per day with a mandatory quest missed
+ROLLOVER_EVENTS = 6 # day_closed and penalty for the last played day and for the skipped run, the reset patch, a spare
+# Longest absence the daily catch-up closes day by day, so the rollover commits as one Firestore batch. n skipped
+# days span n + 2 calendar days (with the last played day and today): a history record each, at most days // 7 + 2
+# week and days // 28 + 2 month rollups, the events and the snapshot.
+MAX_CATCH_UP_DAYS = max(n for n in range(FIRESTORE_BATCH_LIMIT)
+                        if (n + 2) + ((n + 2) // 7 + 2) + ((n + 2) // 28 + 2) + ROLLOVER_EVENTS + 1 <= FIRESTORE_BATCH_LIMIT)
 
 
-# --- 2. FIREBASE DATABASE FUNCTIONS ---
-def initialize_firebase():
-    """Initializes Firebase and returns the Firestore client."""
+# --- 2. STORAGE FUNCTIONS (Firestore by default; see storage.py for SQLite / in-memory) ---
+HUNTER_CACHE_TTL = 300 # Seconds a cached hunter document stays fresh
+RENDER_TIMINGS_KEPT = 50 # Recent render timings kept per session
+
+@st.cache_resource
+def _firestore_client():
+    """Creates the Firestore client once per process; every page and session shares it."""
     if not firebase_admin._apps:
         # Load credentials from Streamlit's secrets management
         creds_dict = dict(st.secrets["firebase_credentials"])
@@ -119,157 +56,686 @@ def initialize_firebase():
         firebase_admin.initialize_app(creds)
     return firestore.client()
 
-def load_data(hunter_name="Hunter"):
-    """Loads the main hunter document."""
-    db = initialize_firebase()
-    doc_ref = db.collection('hunters').document(hunter_name)
-    doc = doc_ref.get()
-    if doc.exists:
-        return doc.to_dict()
+@instrumented("initialize_firebase")
+def initialize_firebase():
+    """Initializes Firebase and returns the (process-wide, cached) Firestore client."""
+    return _firestore_client()
+
+def _storage_setting(key, default=None):
+    """Reads a storage option from the environment first, then from Streamlit secrets."""
+    env_value = os.environ.get(f"SOLO_{key.upper()}")
+    if env_value:
+        return env_value
+    try:
+        return st.secrets.get(key, default)
+    except FileNotFoundError: # No secrets.toml (e.g. a local SQLite setup)
+        return default
+
+@st.cache_resource
+def _configured_storage():
+    """Builds the storage backend selected by `storage_backend` (firestore | sqlite | memory) once per process."""
+    backend = create_storage(
+        _storage_setting("storage_backend", "firestore"),
+        firestore_client_factory=initialize_firebase,
+        sqlite_path=_storage_setting("sqlite_path", "solo_leveling.db"),
+    )
+    return InstrumentedStorage(backend) if backend is not None else None # Every round trip shows on the Diagnostics page
+
+_storage_override = None
+
+def use_storage(backend):
+    """Points core_system at a specific backend (benchmarks, offline runs). Pass None to go back to config."""
+    global _storage_override
+    _storage_override = InstrumentedStorage(backend) if backend is not None else None
+
+def get_storage():
+    """Returns the active storage backend."""
+    return _storage_override if _storage_override is not None else _configured_storage()
+
+@st.cache_resource
+def _hunter_cache():
+    """Process-wide read-through cache of hunter documents: {hunter_name: (loaded_at, data)}."""
+    return {}
+
+def invalidate_hunter_cache(hunter_name):
+    """Drops a hunter from the read-through cache so the next load_data() hits storage."""
+    _hunter_cache().pop(hunter_name, None)
+
+@instrumented("load_data")
+def load_data(hunter_name=DEFAULT_HUNTER):
+    """Loads the hunter: its snapshot document plus the ledger events after it (served from the TTL cache when fresh)."""
+    cache = _hunter_cache()
+    entry = cache.get(hunter_name)
+    if entry and time.monotonic() - entry[0] < HUNTER_CACHE_TTL:
+        return copy.deepcopy(entry[1])
+
+    data = ledger.load_hunter(get_storage(), hunter_name)
+    if data is not None:
+        cache[hunter_name] = (time.monotonic(), data)
+        return copy.deepcopy(data)
     return None
 
+def _pending_writes():
+    """Returns this session's buffer of staged document writes, keyed by document path."""
+    if '_pending_writes' not in st.session_state:
+        st.session_state._pending_writes = {}
+    return st.session_state._pending_writes
+
+def _stage_history(hunter_name, date_str, history_data):
+    """Stages a merge-write of one history day. Repeated stages of the same day are merged."""
+    pending = _pending_writes()
+    path = ('hunters', hunter_name, 'history', date_str)
+    if path in pending:
+        pending[path].update(history_data)
+    else:
+        pending[path] = dict(history_data)
+
+def _day_record(hunter, completed_quests):
+    """The history record of a day: what was completed and where the hunter stood at its end."""
+    return {
+        'completed_quests': list(completed_quests),
+        'gold_at_day_end': hunter['gold'],
+        'xp_at_day_end': hunter['xp'],
+        'level_at_day_end': hunter['level']
+    }
+
+@instrumented("save_data")
 def save_data():
-    """Saves the main hunter state and today's history."""
+    """Stages the main hunter state and today's history. Nothing is sent until flush_writes()."""
     if 'hunter' in st.session_state:
-        db = initialize_firebase()
         hunter_name = st.session_state.hunter['name']
         
-        # 1. Save main hunter document
-        doc_ref = db.collection('hunters').document(hunter_name)
-        doc_ref.set(st.session_state.hunter)
+        # 1. Stage main hunter document (always the latest in-memory state, so repeated saves coalesce)
+        _pending_writes()[('hunters', hunter_name)] = None
         
-        # 2. Save today's history in a sub-collection (This is primarily for 'today's' completed quests)
+        # 2. Stage today's history in a sub-collection (This is primarily for 'today's' completed quests)
+        # (Rollups are derived from the ledger events at flush time, see flush_writes())
         today_str = date.today().isoformat()
-        history_ref = db.collection('hunters').document(hunter_name).collection('history').document(today_str)
-        history_data = {
-            'completed_quests': st.session_state.hunter.get('completed_daily_quests', []),
-            'gold_at_day_end': st.session_state.hunter['gold'], 
-            'xp_at_day_end': st.session_state.hunter['xp'],
-            'level_at_day_end': st.session_state.hunter['level']
-        }
-        history_ref.set(history_data, merge=True)
+        hunter = st.session_state.hunter
+        _stage_history(hunter_name, today_str, _day_record(hunter, hunter.get('completed_daily_quests', [])))
+
+def record_event(event_type, **data):
+    """Applies a ledger event to the hunter and stages it for append (see ledger.py). Returns the event."""
+    hunter = st.session_state.hunter
+    event = ledger.new_event(hunter.get('ledger_seq', 0) + 1, event_type, **data)
+    ledger.apply_event(hunter, event)
+    pending = _pending_writes()
+    pending[('hunters', hunter['name'], ledger.EVENTS_COLLECTION, ledger.event_id(event['seq']))] = event
+    pending[('hunters', hunter['name'])] = None
+    return event
+
+def _staged_events(hunter):
+    """The hunter's staged ledger events, in sequence order."""
+    return sorted((data for path, data in _pending_writes().items()
+                   if len(path) == 4 and path[1] == hunter['name'] and path[2] == ledger.EVENTS_COLLECTION),
+                  key=lambda event: event['seq'])
+
+def _record_residual_patch(hunter):
+    """Records a 'patch' event for changes made outside record_event(), so replaying the ledger rebuilds the hunter."""
+    expected = ledger.replay(hunter.saved_state(), _staged_events(hunter))
+    changes = diff_fields(expected, hunter)
+    if changes:
+        record_event('patch',
+                     set={path: value for path, value in changes.items() if value is not DELETE},
+                     unset=[path for path, value in changes.items() if value is DELETE])
+
+def _snapshot_due(state, base):
+    """A brand-new hunter (no base), or ledger_seq crossed a multiple of SNAPSHOT_EVERY since the base state."""
+    if base is None:
+        return True
+    return state.get('ledger_seq', 0) // ledger.SNAPSHOT_EVERY > base.get('ledger_seq', 0) // ledger.SNAPSHOT_EVERY
+
+def _derived_docs(hunter_name, events):
+    """History records of closed days and rollup increments, derived from ledger events: {path: data}."""
+    docs = {}
+    for event in events:
+        if event['type'] == 'day_closed':
+            # One record per day; over a run of skipped days, each day's penalty lowers the next day's gold
+            for i, day in enumerate(ledger.event_dates(event)):
+                history_data = {key: event[key] for key in ('completed_quests', 'gold_at_day_end', 'xp_at_day_end', 'level_at_day_end')}
+                history_data['gold_at_day_end'] = max(0, event['gold_at_day_end'] - i * event.get('daily_penalty', 0))
+                if event.get('skipped'):
+                    history_data['skipped'] = True # Filled in by the catch-up; the hunter never logged in that day
+                docs[('hunters', hunter_name, 'history', day)] = history_data
+        for doc_id, header, fields in rollups.event_increments(event):
+            rollups.add_fields(docs.setdefault(('hunters', hunter_name, rollups.ROLLUP_COLLECTION, doc_id), dict(header)), fields)
+    return docs
+
+def commit_builder(hunter_name, base, docs, write_snapshot):
+    """Returns the build(batch, state, events) that ledger.commit_events() calls for a flush_writes() commit.
+
+    It adds the staged `docs`, today's history record, the history and rollups derived from the events and,
+    when `write_snapshot` is set and one is due against `base`, the hunter snapshot. Rebuilt on every retry.
+    """
+    today_path = ('hunters', hunter_name, 'history', date.today().isoformat())
+
+    def build(batch, state, events):
+        writes = {path: dict(data) for path, data in docs.items()}
+        if not any(event['type'] == 'focus_logged' for event in events): # A rebase dropped the Forest import
+            writes = {path: data for path, data in writes.items() if path[2] != FOREST_COLLECTION}
+        if events and state.get('last_login') == today_path[3]:
+            writes.setdefault(today_path, {}) # Today's record always matches the ledger (the EOD report reads it)
+        if today_path in writes: # Re-read from the state in case a rebase changed it
+            writes[today_path].update(_day_record(state, state.get('completed_daily_quests', [])))
+        writes.update(_derived_docs(hunter_name, events))
+        for (_, name, collection, doc_id), data in writes.items():
+            batch.set_doc(name, collection, doc_id, data, merge=True)
+        if write_snapshot and _snapshot_due(state, base):
+            batch.set_hunter(hunter_name, dict(state))
+        if len(batch) > FIRESTORE_BATCH_LIMIT: # Must commit atomically (see MAX_CATCH_UP_DAYS)
+            raise RuntimeError(f"{len(batch)} writes for {hunter_name} exceed one batch ({FIRESTORE_BATCH_LIMIT})")
+
+    return build
+
+@instrumented("flush_writes")
+def flush_writes():
+    """Commits every staged write in a single storage batch. Returns the number of commits (0 or 1).
+
+    Hunter changes go out as ledger event appends; the hunter document itself is only
+    rewritten (as a full snapshot) every SNAPSHOT_EVERY events. Closed days' history and the
+    rollups are derived from the events in the same batch. If another session appended to this
+    hunter's ledger first, our events are rebased onto its and the commit is retried (no locks).
+    """
+    pending = _pending_writes()
+    if not pending:
+        return 0
+    hunter = st.session_state.hunter
+    hunter_name = hunter['name']
+    if hunter.persisted and ('hunters', hunter_name) in pending:
+        _record_residual_patch(hunter)
+    events = _staged_events(hunter)
+    docs = {path: data for path, data in pending.items() if len(path) == 4 and path[2] != ledger.EVENTS_COLLECTION}
+    base = hunter.saved_state() if hunter.persisted else None
+    write_snapshot = ('hunters', hunter_name) in pending
+
+    if not events and not docs and not (write_snapshot and _snapshot_due(hunter, base)):
+        pending.clear()
+        hunter.mark_clean()
+        return 0
+    try:
+        build = commit_builder(hunter_name, base, docs, write_snapshot)
+        state, committed, retries = ledger.commit_events(get_storage(), hunter_name, dict(hunter), base, events, build)
+    except WriteConflict: # Still losing the race after MAX_COMMIT_ATTEMPTS: drop ours, show the stored hunter
+        pending.clear()
+        hunter.clear()
+        hunter.update(ledger.load_hunter(get_storage(), hunter_name))
+        hunter.mark_clean()
+        invalidate_hunter_cache(hunter_name)
+        stats = persistence_stats()
+        stats['commit_failures'] = stats.get('commit_failures', 0) + 1
+        st.toast("This hunter is being changed in another session right now, so your last action was not saved. "
+                 "Please try it again.", icon="⚠️")
+        return 0
+    pending.clear()
+    if retries:
+        hunter.clear()
+        hunter.update(state) # Now includes the other session's changes
+        persistence_stats()['commit_retries'] += retries
+        actions = lambda events: sum(event['type'] != 'level_up' for event in events) # Level-ups are recomputed
+        if actions(committed) < actions(events):
+            st.toast("This hunter was changed in another session at the same time. " # A toast survives the rerun that follows
+                     "Actions already done there (or no longer affordable) were skipped.", icon="⚠️")
+    hunter.mark_clean()
+    invalidate_hunter_cache(hunter_name)
+    persistence_stats()['commits_this_rerun'] += 1
+    return 1
+
+def persistence_stats():
+    """Per-session commit counters: commits issued by the current rerun and by the previous one."""
+    if '_persistence_stats' not in st.session_state:
+        st.session_state._persistence_stats = {'reruns': 0, 'commits_this_rerun': 0, 'commits_last_rerun': 0,
+                                               'commit_retries': 0, 'commit_failures': 0}
+    return st.session_state._persistence_stats
+
+def begin_rerun(page=None):
+    """Marks the start of a script run so commits (and, for Diagnostics, every timed call) can be counted per rerun."""
+    ctx = get_script_run_ctx()
+    instrumentation.begin_rerun(page, session=ctx.session_id if ctx else None)
+    stats = persistence_stats()
+    stats['reruns'] += 1
+    stats['commits_last_rerun'] = stats['commits_this_rerun']
+    stats['commits_this_rerun'] = 0
+
+def end_rerun():
+    """Marks the end of a page's script run (closes its Diagnostics rerun record)."""
+    instrumentation.end_rerun()
+
+def commit_and_rerun(scope="app"):
+    """Flushes staged writes in one commit, then reruns the page (or, with scope="fragment", only the calling fragment)."""
+    flush_writes()
+    ctx = get_script_run_ctx()
+    if scope == "fragment" and not (ctx and ctx.fragment_ids_this_run):
+        scope = "app" # A fragment's widget can also fire during a full run, where only an app rerun is allowed
+    st.rerun(scope=scope)
+
+def render_timings():
+    """This session's recent render timings: [(scope, milliseconds)], oldest first."""
+    if '_render_timings' not in st.session_state:
+        st.session_state._render_timings = []
+    return st.session_state._render_timings
+
+@contextmanager
+def render_timer(scope):
+    """Times one render of a page or fragment (also when it ends in st.rerun()) into render_timings()."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = render_timings()
+        timings.append((scope, (time.perf_counter() - started) * 1000))
+        instrumentation.record_call(f"render.{scope}", timings[-1][1])
+        del timings[:-RENDER_TIMINGS_KEPT]
+
+def show_render_timings():
+    """Shows the latest full-page and fragment render times in the sidebar."""
+    latest = {}
+    for scope, ms in render_timings():
+        latest['page' if scope == 'page' else 'fragment'] = (scope, ms)
+    if latest:
+        st.sidebar.caption("⏱ Last render: " + " · ".join(f"{scope} {ms:.1f} ms" for scope, ms in latest.values()))
+
+def show_commit_counter():
+    """Shows how many storage commits the previous rerun issued."""
+    stats = persistence_stats()
+    st.sidebar.caption(f"💾 Storage commits last rerun: {stats['commits_last_rerun']}"
+                       + (f" · {stats['commit_retries']} retried after concurrent edits" if stats['commit_retries'] else "")
+                       + (f" · {stats['commit_failures']} not saved" if stats.get('commit_failures') else ""))
         
 
 # --- 3. STATE INITIALIZATION & DAILY LOGIC ---
-def initialize_state():
-    """Initializes session state with hunter data (loads from Firebase if available)."""
+def current_hunter_name():
+    """The hunter this session plays as: set by select_hunter(), else the ?hunter= URL parameter, else DEFAULT_HUNTER."""
+    if 'hunter_name' not in st.session_state:
+        st.session_state.hunter_name = st.query_params.get('hunter', DEFAULT_HUNTER)
+    return st.session_state.hunter_name
+
+def select_hunter(hunter_name):
+    """Switches this session to another hunter. Staged writes for the current one are committed first."""
+    if 'hunter' in st.session_state and st.session_state.hunter['name'] != hunter_name:
+        flush_writes()
+        del st.session_state['hunter']
+    st.session_state.hunter_name = hunter_name
+
+def new_hunter(hunter_name):
+    """A fresh level-1 hunter document."""
+    return {
+        "name": hunter_name, "rank": "E-Rank", "level": 1, "xp": 0,
+        "xp_to_next_level": int(BASE_XP), "gold": 0, "skill_points": 0,
+        "stats": {"str": 5, "intel": 5, "wil": 5, "fin": 5, "cha": 5},
+        "last_login": NEW_HUNTER_LOGIN, 
+        "completed_daily_quests": [],
+        "daily_limits": {"instagram_mins": 30, "youtube_mins": 45},
+        "eod_report_submitted_today": False,
+        "ledger_seq": 0
+    }
+
+def initialize_state(hunter_name=None):
+    """Initializes session state with hunter data (loads from storage if available)."""
+    if hunter_name is not None:
+        select_hunter(hunter_name)
+    hunter_name = current_hunter_name()
     if 'hunter' not in st.session_state:
-        saved_data = load_data("Hunter") 
+        saved_data = load_data(hunter_name) 
         if saved_data:
-            st.session_state.hunter = saved_data
+            st.session_state.hunter = TrackedHunter(saved_data)
         else:
-            st.session_state.hunter = {
-                "name": "Hunter", "rank": "E-Rank", "level": 1, "xp": 0,
-                "xp_to_next_level": int(BASE_XP), "gold": 0, "skill_points": 0,
-                "stats": {"str": 5, "intel": 5, "wil": 5, "fin": 5, "cha": 5},
-                "last_login": "2000-01-01", 
-                "completed_daily_quests": [],
-                "daily_limits": {"instagram_mins": 30, "youtube_mins": 45},
-                "eod_report_submitted_today": False
-            }
+            st.session_state.hunter = TrackedHunter(new_hunter(hunter_name), persisted=False)
 
         if 'daily_limits' not in st.session_state.hunter:
             st.session_state.hunter['daily_limits'] = {"instagram_mins": 30, "youtube_mins": 45}
         if 'eod_report_submitted_today' not in st.session_state.hunter:
             st.session_state.hunter['eod_report_submitted_today'] = False
 
-def daily_reset_and_check():
-    """Checks for missed mandatory quests from yesterday and resets state for today."""
-    initialize_state() # Ensure state exists before checking
-    hunter = st.session_state.hunter
+def _skipped_dates(last_login_date_str, today):
+    """Dates strictly between the last login and today: days the hunter never opened the app."""
+    day = date.fromisoformat(last_login_date_str) + timedelta(days=1)
+    end = date.fromisoformat(today)
+    while day < end:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+def _close_day(hunter, date_str, completed_quests):
+    """Records a finished day (its history record, see _derived_docs()) and its penalty. Returns the gold lost."""
+    missed = get_catalog().mandatory_missed(completed_quests)
+    record_event('day_closed', date=date_str, missed=missed, **_day_record(hunter, completed_quests))
+    gold_lost = 0
+    if missed:
+        gold_lost = max(0, min(hunter['gold'], MISSED_MANDATORY_PENALTY)) # Ensure gold doesn't go negative
+        if gold_lost:
+            record_event('penalty', date=date_str, gold=gold_lost)
+    return gold_lost
+
+def _close_skipped_days(hunter, skipped):
+    """Records a run of days the hunter never opened the app as one day_closed and one penalty event.
+
+    Same outcome as closing each day with nothing completed. Returns the gold lost.
+    """
+    missed = get_catalog().mandatory_missed([])
+    daily_penalty = MISSED_MANDATORY_PENALTY if missed else 0
+    record_event('day_closed', date=skipped[0], through=skipped[-1], missed=missed, skipped=True,
+                 daily_penalty=daily_penalty, **_day_record(hunter, []))
+    gold_lost = max(0, min(hunter['gold'], daily_penalty * len(skipped)))
+    if gold_lost:
+        record_event('penalty', date=skipped[0], through=skipped[-1], daily=daily_penalty, gold=gold_lost)
+    return gold_lost
+
+@st.cache_resource
+def _reset_gate():
+    """Process-wide reset gate: the date each hunter was last reconciled for, and a rollover lock per hunter."""
+    return {'lock': threading.Lock(), 'reconciled': {}, 'rollover_locks': {}}
+
+def _rollover_lock(hunter_name):
+    gate = _reset_gate()
+    with gate['lock']:
+        return gate['rollover_locks'].setdefault(hunter_name, threading.Lock())
+
+def invalidate_reset_gate(hunter_name):
+    """Forgets that a hunter was reconciled today (this session and process), so the next check runs in full."""
+    with _reset_gate()['lock']:
+        _reset_gate()['reconciled'].pop(hunter_name, None)
+    st.session_state.pop('_reset_checked', None)
+
+def _adopt_stored_hunter(hunter_name):
+    """Swaps the session's stale hunter for the stored one (after this session's staged writes go out)."""
+    flush_writes()
+    saved_data = load_data(hunter_name)
+    if saved_data:
+        st.session_state.hunter = TrackedHunter(saved_data)
+
+@instrumented("daily_reset_and_check")
+def daily_reset_and_check(hunter_name=None):
+    """Closes out every day since the last login (history + penalties) and resets state for today.
+
+    Gated per session and per process: once a hunter is reconciled for today, reruns return at once.
+    The rollover itself runs under a per-hunter lock and is committed before the lock is released, so a
+    second session crossing midnight adopts the result instead of closing the day again. (Sessions in
+    other processes are kept out by the ledger's create-only appends, see flush_writes().)
+    """
     today = date.today().isoformat()
-    
-    if hunter.get('last_login') < today:
-        db = initialize_firebase()
-        last_login_date_str = hunter.get('last_login') # The date that just ended
-
-        # --- HISTORY SAVE FIX (CRUCIAL) ---
-        # 1. Get the history reference for the day that just ended (last_login)
-        history_ref = db.collection('hunters').document(hunter['name']).collection('history').document(last_login_date_str)
-        
-        # 2. Save the final state of the day that just ended (last_login)
-        history_data = {
-            'completed_quests': st.session_state.hunter.get('completed_daily_quests', []),
-            'gold_at_day_end': st.session_state.hunter['gold'], 
-            'xp_at_day_end': st.session_state.hunter['xp'],
-            'level_at_day_end': st.session_state.hunter['level']
-        }
-        history_ref.set(history_data, merge=True)
-        
-        # --- DEBUG PRINT ---
-        print(f"DEBUG: Manually saved history for: {last_login_date_str}")
-        # -------------------
+    name = hunter_name or current_hunter_name()
+    if st.session_state.get('_reset_checked') == (name, today) and 'hunter' in st.session_state:
+        return # Already reconciled in this session today
 
-        # Check for missed mandatory quests from the day that just ended
-        yesterday_completed = history_data.get('completed_quests', [])
+    initialize_state(hunter_name) # Ensure state exists before checking
+    hunter = st.session_state.hunter
+    if hunter.get('last_login') >= today and _reset_gate()['reconciled'].get(name) == today:
+        st.session_state._reset_checked = (name, today)
+        return
+
+    with _rollover_lock(name):
+        if hunter.get('last_login') < today and _reset_gate()['reconciled'].get(name) == today:
+            _adopt_stored_hunter(name) # Another session here already closed the day
+            hunter = st.session_state.hunter
+
+        if hunter.get('last_login') < today:
+            last_login_date_str = hunter.get('last_login') # The last day actually played
+
+            # Nothing to close for a hunter who has never played (avoids a penalty on first-ever login)
+            if last_login_date_str != NEW_HUNTER_LOGIN:
+                # 1. The day that just ended, with whatever was completed on it
+                gold_lost = _close_day(hunter, last_login_date_str, hunter.get('completed_daily_quests', []))
+                if gold_lost:
+                    st.error(f"SYSTEM PENALTY: Mandatory quest missed ({last_login_date_str}). -{gold_lost} Gold.")
+
+                # 2. Catch-up: every day the hunter stayed away gets an empty record and its penalty, as
+                #    two events for the whole run, committed together below. Only the last MAX_CATCH_UP_DAYS
+                #    are closed, so the commit stays one batch; days before that are left unrecorded.
+                skipped = list(_skipped_dates(last_login_date_str, today))[-MAX_CATCH_UP_DAYS:]
+                if skipped:
+                    gold_lost = _close_skipped_days(hunter, skipped)
+                    st.error(f"SYSTEM PENALTY: {len(skipped)} day(s) missed ({skipped[0]} to {skipped[-1]}). -{gold_lost} Gold.")
+
+            # Reset for the new day
+            hunter['last_login'] = today
+            hunter['completed_daily_quests'] = []
+            st.info("A new day has begun. Daily Quests have been reset!")
+            save_data() # Stage the reset hunter state with the day-close history...
+            flush_writes() # ...and commit it in one go while other sessions wait on the lock
+
+        with _reset_gate()['lock']:
+            _reset_gate()['reconciled'][name] = today
+    st.session_state._reset_checked = (name, today)
 
-        mandatory_quests = {k: v for k, v in QUESTS.items() if v.get("is_mandatory")}
-        yesterday_mandatory_missed = any(
-            key not in yesterday_completed for key in mandatory_quests
-        )
-        
-        # Apply penalty if mandatory quests were missed on the logged day
-        if yesterday_mandatory_missed and last_login_date_str != '2000-01-01': # Avoid penalty on first-ever login
-            penalty_gold = 20
-            hunter['gold'] = max(0, hunter['gold'] - penalty_gold) # Ensure gold doesn't go negative
-            st.error(f"SYSTEM PENALTY: Mandatory quest missed yesterday ({last_login_date_str}). -{penalty_gold} Gold.")
-        
-        # --- END OF HISTORY SAVE FIX ---
-        
-        # Reset for the new day
-        hunter['last_login'] = today
-        hunter['completed_daily_quests'] = []
-        st.info("A new day has begun. Daily Quests have been reset!")
-        save_data() # Save the reset hunter state to Firebase
-    
 def check_for_level_up():
-    """Checks if the Hunter has enough XP to level up."""
+    """Applies every level-up the Hunter's XP allows in one step. Returns the number of levels gained."""
     hunter = st.session_state.hunter
-    while hunter['xp'] >= hunter['xp_to_next_level']:
-        hunter['level'] += 1
-        hunter['xp'] -= hunter['xp_to_next_level']
-        hunter['xp_to_next_level'] = int(BASE_XP * (hunter['level'] ** XP_MULTIPLIER))
-        hunter['skill_points'] += 5
+    fields = ledger.level_up_fields(hunter)
+    levels_gained = fields['levels'] if fields else 0
+    if levels_gained:
+        record_event('level_up', **fields)
         st.balloons()
-        st.success(f"LEVEL UP! You are now Level {hunter['level']}! (+5 Skill Points)")
-        save_data()
-        st.rerun()
+        st.success(f"LEVEL UP! You are now Level {hunter['level']}! (+{levels_gained * SKILL_POINTS_PER_LEVEL} Skill Points)")
+        save_data() # Staged; the caller's commit sends it together with the XP grant
+    return levels_gained
+
+def log_quest(quest_key, percentage):
+    """Applies a (partial) quest completion to the hunter. Returns (xp_gained, gold_gained).
+
+    Daily quests only: weekly quests are awarded by their own evaluation (see evaluate_weekly_focus()).
+    """
+    catalog = get_catalog()
+    if quest_key in catalog.weekly:
+        raise ValueError(f"'{quest_key}' is a weekly quest and cannot be logged as a daily one")
+    quest = catalog[quest_key]
+    xp_gained = int(quest['xp'] * (percentage / 100))
+    gold_gained = int(quest['gold'] * (percentage / 100))
+    stat, points = quest['stat_bonus']
+    stat_gained = max(0, int(points * (percentage / 100)))
+
+    # XP, gold, stat and the completed-quest entry (even partial completion logs the effort)
+    record_event('quest_logged', quest=quest_key, percentage=percentage, xp=xp_gained, gold=gold_gained,
+                 stat=stat, points=stat_gained, daily=True)
+    return xp_gained, gold_gained
+
+def purchase_item(item_key):
+    """Buys a store item: costs gold and 1 WIL (never below 1). Returns False if the hunter can't afford it."""
+    hunter = st.session_state.hunter
+    item = STORE_ITEMS[item_key]
+    if hunter['gold'] < item['cost']:
+        return False
+    wil_lost = hunter['stats']['wil'] - max(1, hunter['stats']['wil'] - 1)
+    record_event('purchase', item=item_key, cost=item['cost'], stat='wil', points=wil_lost)
+    return True
+
+def upgrade_stat(stat):
+    """Spends one skill point on a stat."""
+    if st.session_state.hunter['skill_points'] > 0:
+        record_event('stat_upgrade', stat=stat)
+
+# --- 4. HISTORY READER (server-ordered, cursor-paginated, incrementally cached) ---
+HISTORY_PAGE_SIZE = 30
+HISTORY_DAY_CACHE_SIZE = 120 # Raw day documents kept in memory per session and hunter
+
+def _history_cache(hunter_name):
+    """Per-session cache of history summary rows: {'rows': {date: row}, 'exhausted': bool}."""
+    caches = st.session_state.setdefault('_history_cache', {})
+    return caches.setdefault(hunter_name, {'rows': {}, 'exhausted': False})
+
+def _history_days(hunter_name):
+    """Per-session LRU of raw history documents, keyed by date."""
+    caches = st.session_state.setdefault('_history_days', {})
+    return caches.setdefault(hunter_name, OrderedDict())
+
+def history_cache_stats():
+    """Hit/miss counters for the raw history day cache."""
+    return st.session_state.setdefault('_history_day_stats', {'hits': 0, 'misses': 0})
+
+def _remember_history_day(hunter_name, date_str, day):
+    days = _history_days(hunter_name)
+    days[date_str] = day
+    days.move_to_end(date_str)
+    while len(days) > HISTORY_DAY_CACHE_SIZE:
+        days.popitem(last=False)
+
+def get_history_day(date_str):
+    """Returns one raw history document (or None), from memory when the history loader already read it."""
+    hunter_name = st.session_state.hunter['name']
+    days = _history_days(hunter_name)
+    stats = history_cache_stats()
+    if date_str in days:
+        stats['hits'] += 1
+        days.move_to_end(date_str)
+        return days[date_str]
+
+    stats['misses'] += 1
+    day = get_storage().get_history_day(hunter_name, date_str)
+    if day is not None:
+        _remember_history_day(hunter_name, date_str, day)
+    return day
 
-# In core_system.py - The Plan B version
+def _history_row(date_str, day):
+    """Summarizes one history document into a table row."""
+    return {
+        'Date': date_str,
+        'Completed Quests Count': len(set(day.get('completed_quests', []))),
+        'Total Quests Count': get_catalog().daily_total,
+        'End Level': day.get('level_at_day_end', 1),
+        'End XP': day.get('xp_at_day_end', 0),
+        'End Gold': day.get('gold_at_day_end', 0)
+    }
+
+def _fetch_history_page(hunter_name, start_after=None, limit=HISTORY_PAGE_SIZE):
+    """Fetches one page of history, newest first, ordered by document ID (the date) on the server."""
+    return list(get_storage().stream_history(hunter_name, descending=True, start_after=start_after, limit=limit))
+
+def _fetch_history_since(hunter_name, newest):
+    """Fetches the newest cached day and everything after it (the newest day may still be changing)."""
+    return list(get_storage().stream_history(hunter_name, start_at=newest))
+
+def _sync_history_cache(hunter_name, min_rows):
+    """Brings the cache up to date with new days, then pages backwards until it holds min_rows days."""
+    cache = _history_cache(hunter_name)
+    rows = cache['rows']
+    if rows:
+        for date_str, day in _fetch_history_since(hunter_name, max(rows)):
+            rows[date_str] = _history_row(date_str, day)
+            _remember_history_day(hunter_name, date_str, day)
+    else:
+        cache['exhausted'] = False # Nothing cached yet: look again, the first day may have been written since
+    while len(rows) < min_rows and not cache['exhausted']:
+        page = _fetch_history_page(hunter_name, start_after=min(rows) if rows else None)
+        for date_str, day in page:
+            rows[date_str] = _history_row(date_str, day)
+            _remember_history_day(hunter_name, date_str, day)
+        if len(page) < HISTORY_PAGE_SIZE:
+            cache['exhausted'] = True
+    return cache
 
+def has_more_history():
+    """True while older history days remain on the server beyond what the cache holds."""
+    return not _history_cache(st.session_state.hunter['name'])['exhausted']
+
+@instrumented("load_history_data")
 def load_history_data(limit=30):
-    """Fetches history and sorts it in Python (avoids FieldPath)."""
+    """Returns the latest `limit` history days (newest first), reading only days the cache doesn't have."""
     try:
-        db = initialize_firebase()
-        hunter_name = st.session_state.hunter['name']
-        
-        # Firestore ni sort cheyamani adagakunda, just documents techesko
-        history_ref = db.collection('hunters').document(hunter_name).collection('history')
-        docs = history_ref.limit(limit).stream() # Get documents, limit here is just a safety
-        
-        data_list = []
-        for doc in docs:
-            day = doc.to_dict()
-            date_str = doc.id
-            
-            data_list.append({
-                'Date': date_str,
-                'Completed Quests Count': len(set(day.get('completed_quests', []))),
-                'Total Quests Count': len(QUESTS),
-                'End Level': day.get('level_at_day_end', 1),
-                'End XP': day.get('xp_at_day_end', 0),
-                'End Gold': day.get('gold_at_day_end', 0)
-            })
-            
-        if not data_list:
+        cache = _sync_history_cache(st.session_state.hunter['name'], limit)
+        latest = sorted(cache['rows'], reverse=True)[:limit]
+        if not latest:
             return pd.DataFrame()
-
-        # Ippudu manam Python lo (Pandas tho) sort cheddam
-        df = pd.DataFrame(data_list)
-        df_sorted = df.sort_values(by='Date', ascending=False) # Sort by date (descending)
-        
-        return df_sorted
+        return pd.DataFrame([cache['rows'][d] for d in latest])
 
     except Exception as e:
         st.error(f"Error loading history: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+# --- 5. ANALYTICS (whole history as NumPy arrays, see analytics.py) ---
+@instrumented("load_history_analytics")
+def load_history_analytics():
+    """Streaks, rolling rates, velocities and quest adherence over the hunter's entire history.
+
+    The first call per session reads the whole history once; later calls only read from the
+    newest cached day onwards (that day may still be changing), like the history table does.
+    """
+    hunter_name = st.session_state.hunter['name']
+    caches = st.session_state.setdefault('_history_arrays', {})
+    arrays = caches.get(hunter_name)
+    catalog = get_catalog()
+    try:
+        if arrays is None or arrays.catalog is not catalog: # quests.json changed: columns moved
+            arrays = HistoryArrays(get_storage().stream_history(hunter_name), catalog)
+        else:
+            arrays.extend(get_storage().stream_history(hunter_name, start_at=arrays.newest))
+        caches[hunter_name] = arrays
+        return compute_analytics(arrays)
+    except Exception as e:
+        st.error(f"Error computing analytics: {e}")
+        return None
+
+@instrumented("load_current_rollups")
+def load_current_rollups():
+    """This week's and this month's rollup documents ({} where nothing was recorded yet): two reads, no history scan."""
+    hunter_name = st.session_state.hunter['name']
+    storage = get_storage()
+    return {
+        header['period']: storage.get_doc(hunter_name, rollups.ROLLUP_COLLECTION, doc_id) or {}
+        for doc_id, header in rollups.rollup_docs(date.today().isoformat())
+    }
+
+# --- 6. FOREST SYNC (weekly deep-focus quest, fed by Forest session exports) ---
+DEEP_FOCUS_QUEST_KEY = "deep_focus_weekly"
+FOREST_COLLECTION = "forest" # hunters/<name>/forest/<year>: {'sessions': {ISO start time: hours}} of imported sessions
+
+def _roll_focus_week(hunter):
+    """Starts a new focus week (0 hours) once the ISO week changes. Returns True if it did."""
+    today = date.today()
+    week_start = (today - timedelta(days=today.weekday())).isoformat()
+    if hunter.get('focus_week') == week_start:
+        return False
+    hunter['focus_week'] = week_start
+    hunter['weekly_focus_hours'] = 0.0
+    return True
+
+def _imported_forest_sessions(hunter_name):
+    """ISO start times of every Forest session imported so far (one small document per year)."""
+    return {start for _, doc in get_storage().stream_docs(hunter_name, FOREST_COLLECTION)
+            for start in doc.get('sessions', {})}
+
+def import_forest_export(source):
+    """Imports the sessions of a Forest CSV export that were not imported before. Returns the ForestImport.
+
+    Sessions are told apart by start time, so an export from a second device (or one listing a session
+    twice) counts each session once. Recorded as one focus_logged event: hours go into the week rollups
+    (focus_hours), the current week's also into hunter['weekly_focus_hours']. The new sessions' start
+    times are written to FOREST_COLLECTION in the same commit.
+    """
+    hunter = st.session_state.hunter
+    imported = _imported_forest_sessions(hunter['name'])
+    if not imported and hunter.get('forest_last_session') and not hunter.get('forest_tracked_since'):
+        # Imported before start times were kept: all we know is the newest session, so older ones stay skipped
+        hunter['forest_tracked_since'] = hunter['forest_last_session']
+    result = parse_forest_export(source, imported, before=hunter.get('forest_tracked_since'),
+                                 newest=hunter.get('forest_last_session'))
+    _roll_focus_week(hunter)
+    if result.sessions:
+        record_event('focus_logged', week_hours=result.week_hours, sessions=result.sessions,
+                     hours=result.week_hours.get(hunter['focus_week'], 0.0), newest=result.newest)
+        pending = _pending_writes()
+        for start, hours in result.new_sessions.items():
+            path = ('hunters', hunter['name'], FOREST_COLLECTION, start[:4])
+            pending.setdefault(path, {'sessions': {}})['sessions'][start] = hours
+    save_data()
+    return result
+
+def evaluate_weekly_focus():
+    """Awards the weekly deep-focus quest once per week, as soon as the week's hours reach its target.
+
+    Returns True if it was awarded by this call. Stages its changes; the caller commits.
+    """
+    hunter = st.session_state.hunter
+    rolled = _roll_focus_week(hunter)
+    quest = get_catalog()[DEEP_FOCUS_QUEST_KEY]
+    if hunter['weekly_focus_hours'] < quest.get('target_hours', 8) \
+            or hunter.get('deep_focus_claimed_week') == hunter['focus_week']:
+        if rolled:
+            save_data()
+        return False
+
+    stat, points = quest['stat_bonus']
+    # Weekly quest: not added to completed_daily_quests; claimed for this focus week (deep_focus_claimed_week)
+    record_event('quest_logged', quest=DEEP_FOCUS_QUEST_KEY, percentage=100, xp=quest['xp'], gold=quest['gold'],
+                 stat=stat, points=points, daily=False, week=hunter['focus_week'])
+    st.success(f"Weekly Deep Focus Quest COMPLETED! +{quest['xp']} XP, +{quest['gold']} G, +{points} {stat.upper()}.")
+    check_for_level_up()
+    save_data()
+    return True
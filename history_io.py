@@ -0,0 +1,202 @@
+# --- history_io.py ---
+# Streaming export / bulk import of hunter data (hunter documents plus their
+# history and rollups sub-collections), for backups, analysis and moving data
+# between backends. The hunter row is the live state: the stored snapshot
+# caught up with the ledger events after it (see ledger.py), so an import
+# starts from where the hunter stood without needing the events.
+#
+# Export is a generator pipeline: documents are streamed from storage, turned
+# into flat rows and written CHUNK_ROWS at a time, so memory stays bounded no
+# matter how many years of history there are. The file is Parquet (zstd) when
+# pyarrow is installed, gzip-compressed CSV otherwise. Import streams the file
+# back and writes through batched commits of up to 500 documents.
+#
+# Usage:
+#   python history_io.py export hunters.parquet [--hunter NAME ...] [--backend sqlite]
+#   python history_io.py import hunters.parquet [--hunter NAME] [--rename NEW] [--backend memory]
+
+import argparse
+import csv
+import gzip
+import itertools
+import json
+import time
+
+import ledger
+from storage import FIRESTORE_BATCH_LIMIT, create_storage
+
+CHUNK_ROWS = 5000
+SUB_COLLECTIONS = ("history", "rollups")
+
+# Typed columns. Everything else in a document goes, as JSON, into the 'extra' column.
+COLUMNS = ("kind", "hunter", "doc_id", "quests", "level", "xp", "gold", "extra")
+TYPED_FIELDS = {
+    # kind: {document field: column}
+    "hunter": {"completed_daily_quests": "quests", "level": "level", "xp": "xp", "gold": "gold"},
+    "history": {"completed_quests": "quests", "level_at_day_end": "level", "xp_at_day_end": "xp",
+                "gold_at_day_end": "gold"},
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def _is_parquet(path):
+    return str(path).endswith(".parquet")
+
+
+# --- rows <-> documents ---
+def doc_to_row(kind, hunter, doc_id, data):
+    row = dict.fromkeys(COLUMNS)
+    row.update(kind=kind, hunter=hunter, doc_id=doc_id)
+    extra = dict(data)
+    for field, column in TYPED_FIELDS.get(kind, {}).items():
+        if field in extra:
+            row[column] = extra.pop(field)
+    row["extra"] = json.dumps(extra, sort_keys=True, ensure_ascii=False, default=str)
+    return row
+
+
+def row_to_doc(row):
+    data = json.loads(row["extra"]) if row.get("extra") else {}
+    for field, column in TYPED_FIELDS.get(row["kind"], {}).items():
+        if row.get(column) is not None:
+            data[field] = row[column]
+    return data
+
+
+def iter_rows(storage, hunter_names):
+    """Yields one row per hunter document and per sub-collection document, hunter by hunter."""
+    for name, hunter in storage.get_hunters(hunter_names).items():
+        if hunter is None:
+            print(f"[Export] Skipping '{name}': no such hunter.")
+            continue
+        yield doc_to_row("hunter", name, name, ledger.catch_up(storage, name, hunter))
+        for collection in SUB_COLLECTIONS:
+            for doc_id, data in storage.stream_docs(name, collection):
+                yield doc_to_row(collection, name, doc_id, data)
+
+
+def _chunks(rows, size=CHUNK_ROWS):
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, size)):
+        yield chunk
+
+
+# --- writers / readers ---
+def _write_parquet(path, chunks):
+    pa = _pyarrow()
+    schema = pa.schema([
+        ("kind", pa.string()), ("hunter", pa.string()), ("doc_id", pa.string()),
+        ("quests", pa.list_(pa.string())),
+        ("level", pa.int64()), ("xp", pa.int64()), ("gold", pa.int64()),
+        ("extra", pa.string()),
+    ])
+    with pa.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema)) # One row group per chunk
+
+
+def _write_csv(path, chunks):
+    with gzip.open(path, "wt", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for chunk in chunks:
+            for row in chunk:
+                writer.writerow({**row, "quests": None if row["quests"] is None else json.dumps(row["quests"])})
+
+
+def read_rows(path):
+    """Streams rows back from an export file, one chunk in memory at a time."""
+    if _is_parquet(path):
+        pa = _pyarrow()
+        if pa is None:
+            raise RuntimeError("Reading Parquet exports needs pyarrow (pip install pyarrow).")
+        for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=CHUNK_ROWS):
+            yield from batch.to_pylist()
+        return
+    with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            for column in ("level", "xp", "gold"):
+                row[column] = int(row[column]) if row[column] else None
+            row["quests"] = json.loads(row["quests"]) if row["quests"] else None
+            yield row
+
+
+# --- commands ---
+def export_hunters(storage, path, hunter_names=None):
+    """Writes the hunters (default: all) to `path`. Returns the number of rows written."""
+    hunter_names = hunter_names or storage.list_hunters()
+    if _is_parquet(path) and _pyarrow() is None:
+        raise RuntimeError("pyarrow is not installed; export to a .csv.gz path instead.")
+    written = 0
+
+    def counted(chunks):
+        nonlocal written
+        for chunk in chunks:
+            written += len(chunk)
+            yield chunk
+
+    chunks = counted(_chunks(iter_rows(storage, hunter_names)))
+    (_write_parquet if _is_parquet(path) else _write_csv)(path, chunks)
+    return written
+
+
+def import_hunters(storage, path, hunter_name=None, rename=None):
+    """Writes an export back into `storage` (replacing documents with the same IDs). Returns the documents written."""
+    batch, written = storage.batch(), 0
+    for row in read_rows(path):
+        if hunter_name and row["hunter"] != hunter_name:
+            continue
+        name = rename or row["hunter"]
+        data = row_to_doc(row)
+        if row["kind"] == "hunter":
+            batch.set_hunter(name, {**data, "name": name})
+        else:
+            batch.set_doc(name, row["kind"], row["doc_id"], data)
+        if len(batch) >= FIRESTORE_BATCH_LIMIT:
+            batch.commit()
+            written += FIRESTORE_BATCH_LIMIT
+            batch = storage.batch()
+    written += len(batch)
+    if len(batch):
+        batch.commit()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import hunter data.")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", help="Export file: .parquet (needs pyarrow) or .csv.gz")
+    parser.add_argument("--hunter", action="append", help="Only this hunter (export: repeatable).")
+    parser.add_argument("--rename", help="Import: write the hunter under this name instead.")
+    parser.add_argument("--backend", help="Storage backend (default: $SOLO_STORAGE_BACKEND, else firestore).")
+    parser.add_argument("--sqlite-path", help="SQLite file for --backend sqlite.")
+    args = parser.parse_args()
+    if args.command == "import" and args.hunter and len(args.hunter) > 1:
+        parser.error("import takes one --hunter at a time")
+
+    from notifier import initialize_firebase
+    storage = create_storage(args.backend, firestore_client_factory=initialize_firebase, sqlite_path=args.sqlite_path)
+    if storage is None:
+        raise SystemExit("Could not connect to storage.")
+
+    started = time.perf_counter()
+    if args.command == "export":
+        rows = export_hunters(storage, args.path, args.hunter)
+        print(f"[Export] {rows} rows written to {args.path} in {time.perf_counter() - started:.2f} s")
+    else:
+        if args.rename and not args.hunter:
+            raise SystemExit("--rename needs --hunter (one hunter at a time).")
+        docs = import_hunters(storage, args.path, args.hunter[0] if args.hunter else None, args.rename)
+        print(f"[Import] {docs} documents written from {args.path} in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
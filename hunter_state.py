@@ -0,0 +1,50 @@
+# --- hunter_state.py ---
+# Dirty tracking for the hunter dict: a baseline of what storage last saw, so changes
+# made outside ledger events can be recorded as a patch (see core_system.flush_writes()).
+
+import copy
+from storage import DELETE
+
+
+class TrackedHunter(dict):
+    """The hunter dict, plus a baseline copy of what storage last saw.
+
+    Mutate it exactly like a normal dict (nested stats, quest lists, ...);
+    saved_state() returns the baseline to diff or rebase against.
+    """
+
+    def __init__(self, data, persisted=True):
+        super().__init__(data)
+        self.persisted = persisted  # False until the document exists in storage
+        self._baseline = copy.deepcopy(dict(data)) if persisted else {}
+
+    def mark_clean(self):
+        """Records the current state as what storage holds (call after a successful save or load)."""
+        self._baseline = copy.deepcopy(dict(self))
+        self.persisted = True
+
+    def saved_state(self):
+        """A copy of the baseline: the state as of the last load/save."""
+        return copy.deepcopy(self._baseline)
+
+
+def diff_fields(old, new):
+    """Returns {field_path: new_value} for everything that differs between two hunter dicts (DELETE for removed keys)."""
+    changes = {}
+    _diff(old, new, "", changes)
+    return changes
+
+
+def _diff(old, new, prefix, changes):
+    """Collects dotted paths whose values differ. Nested dicts are diffed key by key."""
+    for key, value in new.items():
+        path = f"{prefix}{key}"
+        if key not in old:
+            changes[path] = copy.deepcopy(value)
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            _diff(old[key], value, f"{path}.", changes)
+        elif old[key] != value:
+            changes[path] = copy.deepcopy(value)
+    for key in old:
+        if key not in new:
+            changes[f"{prefix}{key}"] = DELETE
@@ -0,0 +1,224 @@
+# --- instrumentation.py ---
+# Hot-path instrumentation: call counts, latencies and document sizes of storage
+# calls and core functions, plus per-rerun totals, kept in bounded ring buffers
+# shared by every session of the process. pages/4_Diagnostics.py shows them;
+# export() writes them out for offline profiling.
+#
+#   calls:  one record per timed call   (name, ms, docs, bytes, rerun id)
+#   reruns: one record per page rerun   (page, session, ms, calls, storage reads/writes, docs, bytes)
+#
+# Recording is an append to a deque under a lock; sizes are the JSON length of
+# the documents read or written. SOLO_INSTRUMENTATION=0 turns recording off.
+
+import csv
+import io
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+
+from storage import StorageBackend
+
+ENABLED = os.environ.get("SOLO_INSTRUMENTATION", "1") != "0"
+CALLS_KEPT = int(os.environ.get("SOLO_INSTRUMENTATION_CALLS", "20000"))
+RERUNS_KEPT = 1000
+CALL_FIELDS = ("at", "name", "ms", "docs", "bytes", "rerun")
+RERUN_FIELDS = ("id", "page", "session", "at", "ms", "complete", "calls", "storage_reads", "storage_writes",
+                "docs_read", "docs_written", "bytes_read", "bytes_written")
+
+_lock = threading.Lock()
+_calls = deque(maxlen=CALLS_KEPT)
+_reruns = deque(maxlen=RERUNS_KEPT)
+_rerun_ids = itertools.count(1)
+_local = threading.local()  # The rerun being recorded on this thread (Streamlit runs each script run on its own thread)
+
+
+def _size(data):
+    return len(json.dumps(data, default=str)) if data is not None else 0
+
+
+# --- recording ---
+def record_call(name, ms, docs=0, nbytes=0):
+    """Records one timed call and adds it to the current rerun's totals."""
+    if not ENABLED:
+        return
+    rerun = getattr(_local, "rerun", None)
+    with _lock:
+        _calls.append({"at": time.time(), "name": name, "ms": ms, "docs": docs, "bytes": nbytes,
+                       "rerun": rerun["id"] if rerun else None})
+    if rerun is not None:
+        rerun["calls"] += 1
+        if name.startswith("storage.commit"):
+            rerun["storage_writes"] += 1
+            rerun["docs_written"] += docs
+            rerun["bytes_written"] += nbytes
+        elif name.startswith("storage."):
+            rerun["storage_reads"] += 1
+            rerun["docs_read"] += docs
+            rerun["bytes_read"] += nbytes
+
+
+@contextmanager
+def timed(name):
+    """Times the block as one call. The yielded dict takes the call's 'docs' and 'bytes'."""
+    sizes = {"docs": 0, "bytes": 0}
+    started = time.perf_counter()
+    try:
+        yield sizes
+    finally:
+        record_call(name, (time.perf_counter() - started) * 1000, sizes["docs"], sizes["bytes"])
+
+
+def instrumented(name):
+    """Decorator: times every call of the function under `name`."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def begin_rerun(page, session=None):
+    """Starts the rerun record for this thread. An unfinished previous one is closed as incomplete."""
+    if not ENABLED:
+        return
+    end_rerun(complete=False)
+    _local.rerun = {"id": next(_rerun_ids), "page": page, "session": session, "at": time.time(),
+                    "started": time.perf_counter(), "complete": True, "calls": 0, "storage_reads": 0,
+                    "storage_writes": 0, "docs_read": 0, "docs_written": 0, "bytes_read": 0, "bytes_written": 0}
+
+
+def end_rerun(complete=True):
+    """Closes this thread's rerun record (no-op if none is open) and returns it."""
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return None
+    _local.rerun = None
+    rerun["ms"] = (time.perf_counter() - rerun.pop("started")) * 1000
+    rerun["complete"] = complete # False: cut short (st.rerun(), an exception) before end_rerun()
+    with _lock:
+        _reruns.append(rerun)
+    return rerun
+
+
+# --- storage wrapper ---
+class InstrumentedStorage(StorageBackend):
+    """Wraps a backend and records every round trip as a 'storage.<op>' call with its documents and bytes."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def get_hunter(self, name):
+        with timed("storage.get_hunter") as sizes:
+            data = self.inner.get_hunter(name)
+            sizes.update(docs=int(data is not None), bytes=_size(data))
+        return data
+
+    def list_hunters(self):
+        with timed("storage.list_hunters"):
+            return self.inner.list_hunters()
+
+    def get_hunters(self, names):
+        with timed("storage.get_hunters") as sizes:
+            found = self.inner.get_hunters(names)
+            present = [data for data in found.values() if data is not None]
+            sizes.update(docs=len(present), bytes=sum(map(_size, present)))
+        return found
+
+    def get_doc(self, name, collection, doc_id):
+        with timed(f"storage.get_doc.{collection}") as sizes:
+            data = self.inner.get_doc(name, collection, doc_id)
+            sizes.update(docs=int(data is not None), bytes=_size(data))
+        return data
+
+    def get_docs(self, keys):
+        with timed("storage.get_docs") as sizes:
+            found = self.inner.get_docs(keys)
+            present = [data for data in found.values() if data is not None]
+            sizes.update(docs=len(present), bytes=sum(map(_size, present)))
+        return found
+
+    def stream_docs(self, name, collection, **query):
+        with timed(f"storage.stream_docs.{collection}") as sizes: # Drained here so the round trip is what's timed
+            docs = list(self.inner.stream_docs(name, collection, **query))
+            sizes.update(docs=len(docs), bytes=sum(_size(data) for _, data in docs))
+        return iter(docs)
+
+    def _commit(self, ops):
+        with timed("storage.commit") as sizes:
+            sizes.update(docs=len(ops), bytes=sum(_size(op[4]) for op in ops))
+            self.inner._commit(ops)
+
+
+# --- reading the buffers ---
+def calls():
+    with _lock:
+        return list(_calls)
+
+
+def reruns():
+    with _lock:
+        return list(_reruns)
+
+
+def reset():
+    with _lock:
+        _calls.clear()
+        _reruns.clear()
+
+
+def _percentiles(values):
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(np.max(values)), 3)}
+
+
+def call_summary(records=None):
+    """One row per call name: count, latency percentiles, documents and bytes (slowest p95 first)."""
+    groups = {}
+    for call in calls() if records is None else records:
+        groups.setdefault(call["name"], []).append(call)
+    rows = []
+    for name, group in groups.items():
+        rows.append({"name": name, "calls": len(group), **_percentiles([c["ms"] for c in group]),
+                     "total_ms": round(sum(c["ms"] for c in group), 3),
+                     "docs": sum(c["docs"] for c in group), "bytes": sum(c["bytes"] for c in group)})
+    return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+
+def rerun_summary(records=None):
+    """One row per page: rerun count, latency percentiles, mean storage reads / writes per rerun."""
+    groups = {}
+    for rerun in reruns() if records is None else records:
+        groups.setdefault(rerun["page"], []).append(rerun)
+    rows = []
+    for page, group in groups.items():
+        rows.append({"page": page, "reruns": len(group), **_percentiles([r["ms"] for r in group]),
+                     "reads_per_rerun": round(sum(r["storage_reads"] for r in group) / len(group), 2),
+                     "writes_per_rerun": round(sum(r["storage_writes"] for r in group) / len(group), 2),
+                     "kib_per_rerun": round(sum(r["bytes_read"] + r["bytes_written"] for r in group) / len(group) / 1024, 2)})
+    return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+
+def slowest_reruns(n=10, records=None):
+    return sorted(reruns() if records is None else records, key=lambda r: r["ms"], reverse=True)[:n]
+
+
+# --- export ---
+def export(fmt="json"):
+    """Serialises the buffers for offline profiling: 'json' (calls + reruns) or 'csv' (calls only)."""
+    if fmt == "csv":
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=CALL_FIELDS)
+        writer.writeheader()
+        writer.writerows(calls())
+        return out.getvalue()
+    return json.dumps({"exported_at": time.time(), "calls": calls(), "reruns": reruns()}, default=str)
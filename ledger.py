@@ -0,0 +1,235 @@
+# --- ledger.py ---
+# Append-only event ledger for a hunter (hunters/<name>/events/<seq>).
+#
+# Every change to the hunter is a small immutable event. The event is applied
+# to the in-memory state when it is recorded and then appended to storage. The
+# hunter document is only a snapshot: it is rewritten whenever ledger_seq
+# crosses a multiple of SNAPSHOT_EVERY and carries the sequence number it
+# includes (ledger_seq). Loading a hunter means reading the snapshot and
+# replaying the (fewer than SNAPSHOT_EVERY) events after it.
+#
+# Event types:
+#   quest_logged  quest, percentage, xp, gold, stat, points, daily (goes into completed_daily_quests),
+#                 week (weekly deep-focus quest only: the focus week it is claimed for)
+#   level_up      level, xp, xp_to_next_level, skill_points (gained), levels (gained)
+#   purchase      item, cost, stat, points (lost)
+#   stat_upgrade  stat
+#   penalty       date, gold; for a run of skipped days also through (last date) and daily (the per-day cap)
+#   focus_logged  week_hours {week Monday: hours}, hours (for the current focus week), newest, sessions (count):
+#                 a Forest import
+#   day_closed    date, completed_quests, level/xp/gold_at_day_end, missed, skipped: the day's history record;
+#                 a run of skipped days is one event with through (last date) and daily_penalty
+#   patch         set {dotted.path: value}, unset [dotted.path]: any change not covered above
+#                 (daily reset, Forest import, ...), so replaying the ledger always rebuilds the state exactly
+#
+# Concurrency: events are appended with create-only preconditions, so two
+# sessions can never both write event N. The session that loses the race reads
+# the winner's events, rebases its own on top (re-checking each against the new
+# state) and retries. Any number of sessions can write one hunter without a lock
+# and without lost updates.
+
+import copy
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from leveling import apply_level_ups
+from storage import WriteConflict
+
+EVENTS_COLLECTION = "events"
+SNAPSHOT_EVERY = int(os.environ.get("SOLO_SNAPSHOT_EVERY", "20"))
+MAX_COMMIT_ATTEMPTS = 10
+RETRY_BACKOFF = 0.005 # Seconds; the jittered wait doubles with each retry
+
+
+def event_id(seq):
+    """Document ID of an event; zero-padded so ID order is sequence order."""
+    return f"{seq:012d}"
+
+
+def event_dates(event):
+    """The dates a day_closed or penalty event covers: its date, or every day from date through `through`."""
+    day, last = date.fromisoformat(event["date"]), date.fromisoformat(event.get("through", event["date"]))
+    while day <= last:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+
+def new_event(seq, event_type, **data):
+    return {"seq": seq, "type": event_type, "at": datetime.now().isoformat(timespec="seconds"), **data}
+
+
+def level_up_fields(state):
+    """level_up event data for the levels the state's XP allows, or None."""
+    resolved = {key: state[key] for key in ("level", "xp", "xp_to_next_level", "skill_points")}
+    levels = apply_level_ups(resolved)
+    if not levels:
+        return None
+    return {"level": resolved["level"], "xp": resolved["xp"], "xp_to_next_level": resolved["xp_to_next_level"],
+            "skill_points": resolved["skill_points"] - state["skill_points"], "levels": levels}
+
+
+def _get_path(state, path):
+    for part in path.split("."):
+        if not isinstance(state, dict) or part not in state:
+            return None
+        state = state[part]
+    return state
+
+
+def _set_path(state, path, value):
+    *parents, leaf = path.split(".")
+    for part in parents:
+        state = state.setdefault(part, {})
+    state[leaf] = copy.deepcopy(value)
+
+
+def _unset_path(state, path):
+    *parents, leaf = path.split(".")
+    for part in parents:
+        state = state.get(part)
+        if not isinstance(state, dict):
+            return
+    state.pop(leaf, None)
+
+
+def apply_event(state, event):
+    """Applies one event to a hunter dict in place."""
+    kind = event["type"]
+    if kind == "quest_logged":
+        state["xp"] += event["xp"]
+        state["gold"] += event["gold"]
+        if event.get("points"):
+            state["stats"][event["stat"]] += event["points"]
+        if event.get("daily", True):
+            state.setdefault("completed_daily_quests", []).append(event["quest"])
+        if event.get("week"):
+            state["deep_focus_claimed_week"] = event["week"]
+    elif kind == "level_up":
+        state["level"] = event["level"]
+        state["xp"] = event["xp"]
+        state["xp_to_next_level"] = event["xp_to_next_level"]
+        state["skill_points"] += event["skill_points"]
+    elif kind == "purchase":
+        state["gold"] -= event["cost"]
+        if event.get("points"):
+            state["stats"][event["stat"]] -= event["points"]
+    elif kind == "stat_upgrade":
+        state["stats"][event["stat"]] += 1
+        state["skill_points"] -= 1
+    elif kind == "penalty":
+        state["gold"] -= event["gold"]
+    elif kind == "focus_logged":
+        state["weekly_focus_hours"] = round(state.get("weekly_focus_hours", 0.0) + event["hours"], 2)
+        if event.get("newest"):
+            state["forest_last_session"] = event["newest"]
+        state["forest_sessions_imported"] = state.get("forest_sessions_imported", 0) + event.get("sessions", 0)
+    elif kind == "day_closed":
+        pass # Feeds history and rollups; the reset itself is a patch
+    elif kind == "patch":
+        for path, value in event.get("set", {}).items():
+            _set_path(state, path, value)
+        for path in event.get("unset", []):
+            _unset_path(state, path)
+    else:
+        raise ValueError(f"Unknown ledger event type: {kind!r}")
+    state["ledger_seq"] = event["seq"]
+    return state
+
+
+def replay(state, events):
+    """Applies events (ascending seq) on top of a snapshot, skipping any it already includes."""
+    for event in events:
+        if event["seq"] > state.get("ledger_seq", 0):
+            apply_event(state, event)
+    return state
+
+
+def audit(storage, name, after_seq=0):
+    """Yields the hunter's events recorded after `after_seq`, in order (the full ledger by default)."""
+    for _, event in storage.stream_docs(name, EVENTS_COLLECTION, start_after=event_id(after_seq)):
+        yield event
+
+
+def catch_up(storage, name, snapshot):
+    """Brings a hunter snapshot (as stored in the hunter document) up to date with the ledger."""
+    if snapshot is None:
+        return None
+    return replay(snapshot, audit(storage, name, snapshot.get("ledger_seq", 0)))
+
+
+def load_hunter(storage, name):
+    """Latest hunter state: the snapshot plus the events after it."""
+    return catch_up(storage, name, storage.get_hunter(name))
+
+
+# --- concurrency: conditional appends with rebase + retry ---
+def rebase(latest, base, events):
+    """Re-applies our events on top of `latest` (base plus another session's events). Returns (state, kept events).
+
+    Each event is re-checked against the new state: a daily quest (or weekly claim) the other session already
+    logged, a Forest import racing another one, a purchase that is no longer affordable, a stat upgrade
+    without points left or a day the other session already closed is dropped. Level-ups are recomputed from the rebased XP, and patch fields the other
+    session changed too keep its value.
+    """
+    state = copy.deepcopy(latest)
+    kept = []
+
+    def keep(event):
+        event = {**event, "seq": state.get("ledger_seq", 0) + 1}
+        apply_event(state, event)
+        kept.append(event)
+
+    def untouched(path):
+        return _get_path(latest, path) == _get_path(base, path)
+
+    for event in events:
+        kind = event["type"]
+        if kind == "level_up":
+            continue
+        if kind == "quest_logged" and event.get("daily", True) and event["quest"] in state.get("completed_daily_quests", []):
+            continue
+        if kind == "quest_logged" and event.get("week") and state.get("deep_focus_claimed_week") == event["week"]:
+            continue
+        if kind == "focus_logged" and not (untouched("forest_last_session") and untouched("forest_sessions_imported")):
+            continue # The other session imported too; a re-upload imports whatever it did not
+        if kind == "purchase" and state["gold"] < event["cost"]:
+            continue
+        if kind == "stat_upgrade" and state["skill_points"] <= 0:
+            continue
+        if kind in ("penalty", "day_closed") and state.get("last_login", "") > event["date"]:
+            continue
+        if kind == "patch":
+            event = {**event, "set": {path: value for path, value in event.get("set", {}).items() if untouched(path)},
+                     "unset": [path for path in event.get("unset", []) if untouched(path)]}
+            if not event["set"] and not event["unset"]:
+                continue
+        keep(event)
+        if kind == "quest_logged" and (fields := level_up_fields(state)):
+            keep(new_event(0, "level_up", **fields))
+    return state, kept
+
+
+def commit_events(storage, name, state, base, events, build, max_attempts=MAX_COMMIT_ATTEMPTS):
+    """Commits the events (create-only) and the writes build(batch, state, events) derives from them, atomically.
+
+    state: the hunter with the events applied. base: the state they were recorded on top of, or None for a
+    hunter that isn't stored yet (nothing to rebase on). On WriteConflict the other session's events are read,
+    ours are rebased onto them and the batch is rebuilt and retried. Returns (state, events, retries).
+    """
+    for attempt in range(max_attempts):
+        batch = storage.batch()
+        for event in events:
+            batch.create_doc(name, EVENTS_COLLECTION, event_id(event["seq"]), event)
+        build(batch, state, events)
+        try:
+            batch.commit()
+            return state, events, attempt
+        except WriteConflict:
+            if base is None or attempt + 1 == max_attempts:
+                raise
+        latest = replay(copy.deepcopy(base), audit(storage, name, base.get("ledger_seq", 0)))
+        state, events = rebase(latest, base, events)
+        base = latest
+        time.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** attempt))
@@ -0,0 +1,77 @@
+# --- leveling.py ---
+# The XP curve as a precomputed table, so any XP grant resolves to its final
+# level in one binary search instead of a level-by-level loop.
+
+import numpy as np
+
+BASE_XP = 1000
+XP_MULTIPLIER = 1.5
+SKILL_POINTS_PER_LEVEL = 5
+
+
+def xp_to_next_level(level):
+    """XP needed to go from `level` to `level + 1`."""
+    return int(BASE_XP * (level ** XP_MULTIPLIER))
+
+
+class LevelCurve:
+    """Cumulative XP table: cumulative[L] is the total XP needed to reach level L from level 1 with 0 XP."""
+
+    def __init__(self, max_level=1000):
+        self.max_level = 0
+        self.cumulative = np.zeros(2, dtype=np.int64)  # Index 0 unused; level 1 starts at 0 XP
+        self._extend(max_level)
+
+    def _extend(self, max_level):
+        # Thresholds use the exact same Python arithmetic as xp_to_next_level(), so the table never drifts from it
+        start = self.max_level + 1
+        steps = np.array([xp_to_next_level(level) for level in range(start, max_level + 1)], dtype=np.int64)
+        self.cumulative = np.concatenate([self.cumulative[:start + 1], self.cumulative[start] + np.cumsum(steps)])
+        self.max_level = max_level
+
+    def _ensure_total(self, total_xp):
+        while total_xp >= self.cumulative[-1]:
+            self._extend(self.max_level * 2)
+
+    def total_xp(self, level, xp):
+        """Lifetime XP of a hunter at `level` holding `xp` towards the next one."""
+        if level > self.max_level:
+            self._extend(max(level, self.max_level * 2))
+        return int(self.cumulative[level]) + xp
+
+    def resolve(self, total_xp):
+        """Returns (level, xp, xp_to_next_level) for a lifetime XP total. O(log n)."""
+        self._ensure_total(total_xp)
+        level = int(np.searchsorted(self.cumulative, total_xp, side="right")) - 1
+        return level, total_xp - int(self.cumulative[level]), xp_to_next_level(level)
+
+    # --- vectorised queries (analytics) ---
+    def xp_to_reach(self, levels):
+        """Total XP needed to reach each level in `levels` (array-like) from level 1."""
+        levels = np.asarray(levels, dtype=np.int64)
+        if levels.size and levels.max() > self.max_level:
+            self._extend(int(levels.max()))
+        return self.cumulative[levels]
+
+    def levels_for(self, totals):
+        """Level reached for each lifetime XP total in `totals` (array-like)."""
+        totals = np.asarray(totals, dtype=np.int64)
+        if totals.size:
+            self._ensure_total(int(totals.max()))
+        return np.searchsorted(self.cumulative, totals, side="right") - 1
+
+
+LEVEL_CURVE = LevelCurve()
+
+
+def apply_level_ups(hunter, curve=LEVEL_CURVE):
+    """Resolves the hunter's XP to its final level in place. Returns the number of levels gained."""
+    if hunter['xp'] < hunter['xp_to_next_level']:
+        return 0
+    level, xp, next_level_xp = curve.resolve(curve.total_xp(hunter['level'], hunter['xp']))
+    levels_gained = level - hunter['level']
+    hunter['level'] = level
+    hunter['xp'] = xp
+    hunter['xp_to_next_level'] = next_level_xp
+    hunter['skill_points'] += SKILL_POINTS_PER_LEVEL * levels_gained
+    return levels_gained
@@ -1,14 +1,19 @@
 # --- notifier.py (The FINAL, All-in-One "Intelligent System" Version) ---
 
 import os
+import sys
 import json
 import datetime
-import pytz
+import time
+import heapq
+import argparse
+import copy
+import threading
 import random
-import firebase_admin
-from firebase_admin import credentials, firestore
-from twilio.rest import Client
-import requests
+from zoneinfo import ZoneInfo
+# Third-party clients (requests, twilio, firebase_admin) and the storage layer are
+# imported inside the functions that use them, so each scheduled run only pays for
+# what its action needs. See ACTION_MODULES and --profile-startup.
 
 # ----------------- CONFIGURATION -----------------
 # All secrets will be fetched from GitHub Secrets
@@ -18,6 +23,16 @@ TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
 TWILIO_FROM_NUMBER = os.environ.get("TWILIO_FROM_NUMBER")
 YOUR_WHATSAPP_NUMBER = os.environ.get("YOUR_WHATSAPP_NUMBER")
 FIREBASE_CREDS_JSON_STRING = os.environ.get("FIREBASE_CREDS_JSON")
+# Comma-separated hunter documents to report on; every hunter in storage when unset.
+# Each hunter may carry its own "whatsapp_number", "ntfy_topic" and "eod_channel" (whatsapp | ntfy).
+HUNTER_NAMES = [n.strip() for n in os.environ.get("HUNTER_NAMES", "").split(",") if n.strip()]
+NTFY_SERVER = os.environ.get("NTFY_SERVER", "https://ntfy.sh").rstrip("/")
+EOD_CHANNEL = os.environ.get("EOD_CHANNEL", "whatsapp")
+EOD_MAX_WORKERS = int(os.environ.get("EOD_MAX_WORKERS", "8"))
+EOD_RATE_LIMIT_PER_SEC = float(os.environ.get("EOD_RATE_LIMIT_PER_SEC", "10")) # 0 = no limit
+# How long one run keeps retrying failed sends (in backoff) before leaving them in the outbox for the next run
+OUTBOX_DRAIN_SECONDS = float(os.environ.get("OUTBOX_DRAIN_SECONDS", "120"))
+IST = ZoneInfo('Asia/Kolkata')
 
 #----------------- API LINKS -----------------
 SOLO_LEVELING_API_URL = "https://solo-leveling-game-badri.streamlit.app/"
@@ -89,26 +104,66 @@ MESSAGE_POOL = {
     }
 }
 
+# ----------------- POOLED CLIENTS -----------------
+# Created once per process and shared by every send (and every worker thread)
+_clients_lock = threading.Lock()
+_http_session = None
+_twilio_client = None
+
+def get_http_session():
+    global _http_session
+    with _clients_lock:
+        if _http_session is None:
+            import requests
+            import requests.adapters
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max(10, EOD_MAX_WORKERS))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+    return _http_session
+
+def get_twilio_client():
+    global _twilio_client
+    with _clients_lock:
+        if _twilio_client is None:
+            from twilio.rest import Client
+            _twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    return _twilio_client
+
 # ----------------- SENDER FUNCTIONS -----------------
-def send_ntfy_notification(message, title, tags=""):
+# Both senders return True when the provider accepted the message.
+def _ntfy_header(text):
+    # HTTP headers are latin-1; ntfy accepts RFC 2047 encoded words for anything else (emoji titles)
+    try:
+        text.encode('latin-1')
+        return text
+    except UnicodeEncodeError:
+        from email.header import Header
+        return Header(text, 'utf-8').encode()
+
+def send_ntfy_notification(message, title, tags="", topic=None):
     try:
-        resp = requests.post(
-            f"https://ntfy.sh/{NTFY_TOPIC}",
+        resp = get_http_session().post(
+            f"{NTFY_SERVER}/{topic or NTFY_TOPIC}",
             data=message.encode('utf-8'),
-            headers={"Title": title, "Tags": tags},
+            headers={"Title": _ntfy_header(title), "Tags": tags},
             timeout=5
         )
         if resp.ok:
             print(f"[ntfy] Notification sent successfully (status {resp.status_code}).")
         else:
             print(f"[ntfy] Failed to send notification: status={resp.status_code} body={resp.text}")
+        return resp.ok
     except Exception as e:
         print(f"[ntfy] Failed to send notification: {e}")
+        return False
 
-def send_whatsapp_notification(title, message):
-    if not all([TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM_NUMBER, YOUR_WHATSAPP_NUMBER]):
+def send_whatsapp_notification(title, message, to_number=None):
+    to_number = to_number or YOUR_WHATSAPP_NUMBER
+    if not all([TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM_NUMBER, to_number]):
         print("[WhatsApp] Twilio credentials are not set. Skipping.")
-        return
+        return False
     try:
         def _ensure_whatsapp_prefix(num):
             if not num:
@@ -116,17 +171,56 @@ def send_whatsapp_notification(title, message):
             return num if num.startswith("whatsapp:") else f"whatsapp:{num}"
 
         from_num = _ensure_whatsapp_prefix(TWILIO_FROM_NUMBER)
-        to_num = _ensure_whatsapp_prefix(YOUR_WHATSAPP_NUMBER)
+        to_num = _ensure_whatsapp_prefix(to_number)
 
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
         full_message = f"*{title}*\n\n{message}"
-        client.messages.create(body=full_message, from_=from_num, to=to_num)
+        get_twilio_client().messages.create(body=full_message, from_=from_num, to=to_num)
         print(f"[WhatsApp] Notification sent successfully for: {title}")
+        return True
     except Exception as e:
         print(f"[WhatsApp] Failed to send notification: {e}")
+        return False
+
+# ----------------- OUTBOX -----------------
+# Every notification goes through a durable local outbox (outbox.py): enqueued once per
+# idempotency key, then sent by drain_outbox() with retries, backoff and per-channel limits.
+_outbox = None
+
+def get_outbox():
+    global _outbox
+    with _clients_lock:
+        if _outbox is None:
+            from outbox import Outbox
+            _outbox = Outbox()
+    return _outbox
+
+# fn(recipient, title, body, tags) -> bool; a None recipient means the configured default
+OUTBOX_SENDERS = {
+    "ntfy": lambda topic, title, body, tags: send_ntfy_notification(body, title, tags=tags, topic=topic),
+    "whatsapp": lambda number, title, body, tags: send_whatsapp_notification(title, body, to_number=number),
+}
+
+def notify(key, channel, title, message, tags="", recipient=None, outbox=None):
+    """Queues a notification under an idempotency key. Returns False if that key was already queued or sent."""
+    added = (outbox or get_outbox()).enqueue(key, channel, recipient, title, message, tags)
+    if not added:
+        print(f"[Outbox] '{key}' was already queued; not sending it again.")
+    return added
+
+def drain_outbox(outbox=None, wait_s=None, concurrency=None, limiter=None):
+    """Sends everything due, retrying failures for up to wait_s seconds (default OUTBOX_DRAIN_SECONDS)."""
+    outbox = outbox or get_outbox()
+    wait_s = OUTBOX_DRAIN_SECONDS if wait_s is None else wait_s
+    result = outbox.drain(OUTBOX_SENDERS, concurrency=concurrency, limiter=limiter, deadline=time.time() + wait_s)
+    metrics = outbox.metrics()
+    print(f"[Outbox] Sent {result.sent}, failed {result.failed} ({result.dead} gave up). "
+          f"Queue depth {metrics['depth']}, delivery p95 {metrics['delivery_p95_ms']} ms.")
+    return result
 
 # ----------------- FIREBASE & REPORTING FUNCTIONS -----------------
 def initialize_firebase():
+    import firebase_admin
+    from firebase_admin import credentials, firestore
     if not firebase_admin._apps:
         if not FIREBASE_CREDS_JSON_STRING:
             print("[Firebase] Credentials JSON not found in environment.")
@@ -142,63 +236,380 @@ def initialize_firebase():
             return None
     return firestore.client()
 
-def generate_and_send_eod_report(db):
-    print("[EOD Report] Starting report generation...")
-    try:
-        hunter_ref = db.collection('hunters').document('Hunter')
-        hunter_doc = hunter_ref.get()
-        if not hunter_doc.exists:
-            print("[EOD Report] Error: Hunter document not found.")
-            return
-        hunter_data = hunter_doc.to_dict()
-        completed_today = len(hunter_data.get('completed_daily_quests', []))
-        total_quests = 18  # Adjust if you add/remove quests
-
-        title = f"👑 Monarch's EOD Report: {datetime.date.today().isoformat()} 👑"
-        message = (
-            f"Quests Completed Today: {completed_today}/{total_quests}\n"
-            f"Current Level: {hunter_data.get('level', 'N/A')}\n"
-            f"XP Progress: {hunter_data.get('xp', 0)}/{hunter_data.get('xp_to_next_level', 'N/A')}\n"
-            f"Final Gold: {hunter_data.get('gold', 0)} G\n\n"
-            "Report generated automatically. Your efforts have been recorded. Rest and prepare for tomorrow's ascent."
+_storage = None
+
+def get_storage():
+    # Backend comes from SOLO_STORAGE_BACKEND (firestore | sqlite | memory); Firestore by default.
+    # Built once per process, so a long-running daemon keeps its connection warm.
+    global _storage
+    if _storage is None:
+        try:
+            from storage import create_storage
+            _storage = create_storage(firestore_client_factory=initialize_firebase)
+        except Exception as e:
+            print(f"[Storage] CRITICAL ERROR initializing: {e}")
+    return _storage
+
+def build_eod_report(hunter_data, report_date, week=None):
+    # `week` is the hunter's rollup document for the report's ISO week (see rollups.py), if there is one
+    from quest_registry import get_catalog
+    completed_today = len(set(hunter_data.get('completed_daily_quests', [])))
+    total_quests = get_catalog().daily_total  # Daily quests only; the weekly one isn't tracked per day
+
+    title = f"👑 Monarch's EOD Report: {report_date} 👑"
+    message = (
+        f"Quests Completed Today: {completed_today}/{total_quests}\n"
+        f"Current Level: {hunter_data.get('level', 'N/A')}\n"
+        f"XP Progress: {hunter_data.get('xp', 0)}/{hunter_data.get('xp_to_next_level', 'N/A')}\n"
+        f"Final Gold: {hunter_data.get('gold', 0)} G\n\n"
+    )
+    if week:
+        message += (
+            f"This Week: {week.get('quests_completed', 0)} quests, +{week.get('xp_earned', 0)} XP, "
+            f"+{week.get('levels_gained', 0)} levels\n"
+            f"Gold This Week: +{week.get('gold_earned', 0)} earned, -{week.get('gold_spent', 0)} spent, "
+            f"-{week.get('gold_penalty', 0)} penalties\n\n"
         )
-        send_whatsapp_notification(title, message)
-    except Exception as e:
-        print(f"[EOD Report] CRITICAL ERROR generating report: {e}")
+    message += "Report generated automatically. Your efforts have been recorded. Rest and prepare for tomorrow's ascent."
+    return title, message
 
-# ----------------- MAIN EXECUTION LOGIC -----------------
-if __name__ == "__main__":
-    test_hour_str = os.environ.get("TEST_HOUR_OVERRIDE")
-    
-    if test_hour_str and test_hour_str.isdigit():
-        print(f"--- RUNNING IN TEST MODE FOR HOUR: {test_hour_str} ---")
-        current_hour = int(test_hour_str)
-    else:
-        IST = pytz.timezone('Asia/Kolkata')
-        current_hour = datetime.datetime.now(IST).hour
+def eod_destination(hunter_data):
+    """(channel, recipient, tags) of a hunter's EOD report: its own channel, falling back to EOD_CHANNEL."""
+    if hunter_data.get('eod_channel', EOD_CHANNEL) == "ntfy":
+        return "ntfy", hunter_data.get('ntfy_topic'), "crown"
+    return "whatsapp", hunter_data.get('whatsapp_number'), ""
+
+class RateLimiter:
+    # Spaces sends out to at most `rate` per second across all worker threads (rate <= 0 disables it)
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+def gather_eod_data(storage, hunter_names, report_date):
+    """Reads what the EOD reports need for many hunters in a constant number of batched gets.
+
+    Returns ({name: (hunter_data, week) or None}, fallbacks). One get_hunters() for the snapshots, then
+    one get_docs() for each hunter's history day, week rollup and the ledger event after its snapshot.
+    The history day is rewritten on every commit, so it carries the day-end level, XP, gold and quests
+    without replaying the ledger. Hunters with newer events but no activity today get a second get_docs()
+    over their unsnapshotted events (fewer than SNAPSHOT_EVERY, see ledger.py); only one whose ledger runs
+    past that window is caught up on its own. `fallbacks` counts those.
+    """
+    from ledger import EVENTS_COLLECTION, SNAPSHOT_EVERY, catch_up, event_id, replay
+    from leveling import xp_to_next_level
+    from rollups import ROLLUP_COLLECTION, week_id
+    hunters = storage.get_hunters(hunter_names)
+    week_doc = week_id(datetime.date.fromisoformat(report_date))
+    found = {name: data for name, data in hunters.items() if data is not None}
+
+    def seq(name):
+        return found[name].get("ledger_seq", 0)
+
+    keys = {name: ((name, "history", report_date), (name, ROLLUP_COLLECTION, week_doc),
+                   (name, EVENTS_COLLECTION, event_id(seq(name) + 1))) for name in found}
+    docs = storage.get_docs([key for hunter_keys in keys.values() for key in hunter_keys])
+
+    # Newer events but no history day today: read the rest of the snapshot window, up to and including the
+    # next multiple of SNAPSHOT_EVERY (a commit reaching it would have rewritten the snapshot)
+    stale = [name for name, (history_key, _, next_key) in keys.items()
+             if docs[history_key] is None and docs[next_key] is not None]
+    windows = {name: [(name, EVENTS_COLLECTION, event_id(n))
+                      for n in range(seq(name) + 2, (seq(name) // SNAPSHOT_EVERY + 1) * SNAPSHOT_EVERY + 1)]
+               for name in stale}
+    if stale:
+        docs.update(storage.get_docs([key for window in windows.values() for key in window]))
+
+    gathered, fallbacks = {}, 0
+    for name, hunter_data in hunters.items():
+        if hunter_data is None:
+            gathered[name] = None
+            continue
+        history_key, week_key, next_key = keys[name]
+        day = docs[history_key]
+        if name in windows:
+            events = [docs[next_key]]
+            for key in windows[name]:
+                if docs[key] is None:
+                    break
+                events.append(docs[key])
+            if len(events) <= len(windows[name]):
+                hunter_data = replay(copy.deepcopy(hunter_data), events)
+            else: # The whole window was written, so the ledger may go on past it
+                hunter_data = catch_up(storage, name, hunter_data)
+                fallbacks += 1
+        hunter_data = dict(hunter_data)
+        if day is not None:
+            if day.get("level_at_day_end", hunter_data["level"]) != hunter_data["level"]:
+                hunter_data["xp_to_next_level"] = xp_to_next_level(day["level_at_day_end"])
+            hunter_data.update(level=day.get("level_at_day_end", hunter_data["level"]),
+                               xp=day.get("xp_at_day_end", hunter_data["xp"]),
+                               gold=day.get("gold_at_day_end", hunter_data["gold"]),
+                               completed_daily_quests=day.get("completed_quests", []))
+        elif hunter_data.get("last_login") != report_date:
+            hunter_data["completed_daily_quests"] = [] # Nothing logged today; those are an earlier day's quests
+        gathered[name] = (hunter_data, docs[week_key])
+    return gathered, fallbacks
+
+def run_eod_pipeline(storage, hunter_names=None, max_workers=None, rate_limit=None, outbox=None, run_id=None):
+    """Gathers every hunter's report data in a few batched gets, renders all reports into the outbox in one pass,
+    then drains it through a bounded pool.
 
-    print(f"Script logic is running for hour: {current_hour} (IST)")
+    Reports are keyed "eod:<run_id>:<hunter>" (run_id defaults to today's IST date), so a re-run sends nothing twice.
+    """
+    started = time.perf_counter()
+    hunter_names = hunter_names or HUNTER_NAMES or storage.list_hunters()
+    print(f"[EOD Report] Starting report generation for {len(hunter_names)} hunter(s)...")
 
-    if current_hour == 7:
+    report_date = datetime.datetime.now(IST).date().isoformat() # The IST day, like run_scheduled_action()'s run_id
+    run_id = run_id or report_date
+    outbox = outbox or get_outbox()
+    gathered, fallbacks = gather_eod_data(storage, hunter_names, report_date)
+    gather_s = time.perf_counter() - started
+
+    reports = queued = 0
+    for hunter_name, found in gathered.items():
+        if found is None:
+            print(f"[EOD Report] Error: Hunter document '{hunter_name}' not found.")
+            continue
+        hunter_data, week = found
+        title, message = build_eod_report(hunter_data, report_date, week)
+        channel, recipient, tags = eod_destination(hunter_data)
+        reports += 1
+        queued += notify(f"eod:{run_id}:{hunter_name}", channel, title, message, tags, recipient, outbox)
+
+    limiter = RateLimiter(EOD_RATE_LIMIT_PER_SEC if rate_limit is None else rate_limit)
+    workers = max_workers or EOD_MAX_WORKERS
+    result = drain_outbox(outbox, concurrency={"ntfy": workers, "whatsapp": workers}, limiter=limiter)
+    latencies_ms = result.send_ms
+    summary = {
+        "hunters": len(hunter_names),
+        "reports": reports,
+        "queued": queued,
+        "duplicates": reports - queued,
+        "catch_up_fallbacks": fallbacks,
+        "gather_s": round(gather_s, 3),
+        "sent": result.sent,
+        "failed": result.failed,
+        "gave_up": result.dead,
+        "queue_depth": outbox.metrics()["depth"],
+        "send_p50_ms": round(_percentile(latencies_ms, 50), 1),
+        "send_p90_ms": round(_percentile(latencies_ms, 90), 1),
+        "send_p99_ms": round(_percentile(latencies_ms, 99), 1),
+        "send_max_ms": round(max(latencies_ms), 1) if latencies_ms else 0.0,
+        "total_s": round(time.perf_counter() - started, 3),
+    }
+    print(f"[EOD Report] Run summary: {json.dumps(summary)}")
+    return summary
+
+def generate_and_send_eod_report(storage, hunter_names=None, run_id=None):
+    try:
+        return run_eod_pipeline(storage, hunter_names, run_id=run_id)
+    except Exception as e:
+        print(f"[EOD Report] CRITICAL ERROR generating reports: {e}")
+
+# ----------------- SCHEDULED ACTIONS -----------------
+HANDSHAKE_HOUR = 7
+EOD_HOUR = 21
+
+def run_scheduled_action(current_hour, run_id=None):
+    # run_id names this slot's messages in the outbox (default: today's date), so running a slot twice sends once
+    run_id = run_id or datetime.datetime.now(IST).date().isoformat()
+    if current_hour == HANDSHAKE_HOUR:
         title = "🤝 System Handshake Required"
         # IKKADA NEE JOIN CODE PETTU MAWA
         join_code = "Join automobile-one" 
         message = f"Hunter, activate the WhatsApp channel for today's messages. Your code is: `{join_code}`"
         print("Sending daily handshake reminder via ntfy...")
-        send_ntfy_notification(message, title, tags="handshake")
+        notify(f"handshake:{run_id}", "ntfy", title, message, tags="handshake")
+        drain_outbox()
 
-    elif current_hour == 21:
+    elif current_hour == EOD_HOUR:
         print("Starting EOD report generation...")
-        db = initialize_firebase()
-        if db:
-            generate_and_send_eod_report(db)
+        storage = get_storage()
+        if storage:
+            generate_and_send_eod_report(storage, run_id=run_id)
 
     elif current_hour in MESSAGE_POOL:
         notification = MESSAGE_POOL[current_hour]
         title = notification["title"]
         message = random.choice(notification["messages"])
         print(f"Sending scheduled WhatsApp ping for hour {current_hour}: '{title}'")
-        send_whatsapp_notification(title, message)
+        notify(f"ping:{run_id}:{current_hour:02d}", "whatsapp", title, message)
+        drain_outbox()
+
+    else:
+        print(f"No special task scheduled for hour {current_hour}. Exiting.")
+
+# ----------------- STARTUP PROFILE -----------------
+# Modules each action imports on first use (the storage backend decides whether firebase_admin is needed)
+ACTION_MODULES = {
+    "handshake": ["outbox", "requests"],
+    "whatsapp_ping": ["outbox", "twilio.rest"],
+    "eod_report": ["outbox", "storage", "ledger", "firebase_admin", "firebase_admin.firestore", "twilio.rest", "requests"],
+}
+
+def action_for_hour(hour):
+    if hour == HANDSHAKE_HOUR:
+        return "handshake"
+    if hour == EOD_HOUR:
+        return "eod_report"
+    return "whatsapp_ping" if hour in MESSAGE_POOL else None
+
+def preload_action_modules(action):
+    import importlib
+    for module in ACTION_MODULES.get(action, []):
+        importlib.import_module(module)
+
+def _importtime_profile(code):
+    # Runs `code` in a fresh interpreter with -X importtime; returns (wall_ms, [(cumulative_us, self_us, module)] for top-level imports)
+    import subprocess
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall_ms = (time.perf_counter() - started) * 1000
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not name[1:].startswith(" "): # Direct imports only; nested ones are inside their parent's cumulative time
+            modules.append((int(cumulative_us), int(self_us), name.strip()))
+    return wall_ms, sorted(modules, reverse=True)
+
+def profile_startup(top=8):
+    """Prints per-module import time for a cold start of each scheduled action."""
+    _, interpreter_modules = _importtime_profile("pass")
+    baseline = {name for _, _, name in interpreter_modules} # site, encodings, ... (paid by every Python process)
+    cases = [("notifier (module only)", "import notifier")]
+    cases += [(action, f"import notifier; notifier.preload_action_modules({action!r})") for action in ACTION_MODULES]
+    for label, code in cases:
+        wall_ms, modules = _importtime_profile(code)
+        modules = [m for m in modules if m[2] not in baseline]
+        total_ms = sum(cumulative for cumulative, _, _ in modules) / 1000
+        print(f"\n=== {label}: {total_ms:.1f} ms importing, {wall_ms:.0f} ms interpreter wall time ===")
+        for cumulative, self_us, name in modules[:top]:
+            print(f"  {cumulative / 1000:9.1f} ms  (self {self_us / 1000:7.1f} ms)  {name}")
 
+# ----------------- DAEMON MODE -----------------
+# One long-running process instead of a cold start per cron entry: imports, the
+# storage connection and the HTTP/Twilio clients are set up once and stay warm.
+# (hour, minute) in IST for every slot, matching the cron entries in daily_notifications.yml
+DAEMON_SLOTS = sorted([(hour, 0) for hour in MESSAGE_POOL] + [(HANDSHAKE_HOUR, 0), (EOD_HOUR, 30)])
+NOTIFIER_STATE_FILE = os.environ.get("NOTIFIER_STATE_FILE", "notifier_state.json")
+# Slots missed while the daemon was down are still sent if they are at most this late
+CATCHUP_WINDOW = datetime.timedelta(hours=float(os.environ.get("NOTIFIER_CATCHUP_HOURS", "3")))
+MAX_SLEEP_SECONDS = 60 # Re-check the clock at least this often (suspend/resume, clock changes)
+
+def _slot_time(day, slot):
+    return datetime.datetime.combine(day, datetime.time(*slot), tzinfo=IST)
+
+def _slot_key(slot):
+    return f"{slot[0]:02d}:{slot[1]:02d}"
+
+def _load_daemon_state():
+    try:
+        with open(NOTIFIER_STATE_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"last_run": {}}
+
+def _save_daemon_state(state):
+    tmp_path = f"{NOTIFIER_STATE_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, NOTIFIER_STATE_FILE)
+
+def build_schedule(now, state):
+    """Heap of (fire_at, slot). Recently missed slots that never ran are due immediately."""
+    heap = []
+    for slot in DAEMON_SLOTS:
+        today_at = _slot_time(now.date(), slot)
+        previous = today_at if today_at <= now else _slot_time(now.date() - datetime.timedelta(days=1), slot)
+        last_run = state["last_run"].get(_slot_key(slot))
+        missed = last_run is None or datetime.datetime.fromisoformat(last_run) < previous
+        if missed and now - previous <= CATCHUP_WINDOW:
+            heapq.heappush(heap, (previous, slot))
+        else:
+            heapq.heappush(heap, (_slot_time(previous.date() + datetime.timedelta(days=1), slot), slot))
+    return heap
+
+def run_daemon():
+    state = _load_daemon_state()
+    for action in ACTION_MODULES:
+        preload_action_modules(action) # Pay every import once, up front
+    heap = build_schedule(datetime.datetime.now(IST), state)
+    print(f"[Daemon] Started. Next slot: {_slot_key(heap[0][1])} at {heap[0][0].isoformat()}")
+    try:
+        while True:
+            fire_at, slot = heap[0]
+            wait = (fire_at - datetime.datetime.now(IST)).total_seconds()
+            if wait > 0:
+                # Between slots, retry whatever is due in the outbox (failed sends waiting out their backoff)
+                due = get_outbox().next_due()
+                if due is not None and due <= time.time():
+                    drain_outbox(wait_s=0)
+                    due = get_outbox().next_due()
+                retry_in = due - time.time() if due is not None else MAX_SLEEP_SECONDS
+                time.sleep(max(0.0, min(wait, MAX_SLEEP_SECONDS, retry_in)))
+                continue
+
+            heapq.heappop(heap)
+            late = datetime.datetime.now(IST) - fire_at
+            if late > datetime.timedelta(minutes=1):
+                print(f"[Daemon] Catching up on {_slot_key(slot)} slot from {fire_at.isoformat()} ({late} late)")
+            try:
+                run_scheduled_action(slot[0], run_id=fire_at.date().isoformat())
+            except Exception as e:
+                print(f"[Daemon] Slot {_slot_key(slot)} failed: {e}")
+            state["last_run"][_slot_key(slot)] = fire_at.isoformat()
+            _save_daemon_state(state)
+            heapq.heappush(heap, (_slot_time(fire_at.date() + datetime.timedelta(days=1), slot), slot))
+    except KeyboardInterrupt:
+        print("[Daemon] Stopped.")
+
+# ----------------- MAIN EXECUTION LOGIC -----------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solo Leveling notifier")
+    parser.add_argument("--daemon", action="store_true", help="Stay running and send every slot from an in-process scheduler.")
+    parser.add_argument("--profile-startup", action="store_true", help="Report per-module import time for each action and exit.")
+    parser.add_argument("--outbox-stats", action="store_true", help="Print outbox queue depth, delivery latency and dead letters, and exit.")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        profile_startup()
+    elif args.outbox_stats:
+        print(json.dumps(get_outbox().metrics(), indent=2))
+        for message in get_outbox().dead_letters():
+            print(f"[Outbox] Gave up on {message['key']} ({message['channel']}) after {message['attempts']} attempts: {message['last_error']}")
+    elif args.daemon:
+        run_daemon()
     else:
-        print(f"No special task scheduled for hour {current_hour}. Exiting.")
\ No newline at end of file
+        test_hour_str = os.environ.get("TEST_HOUR_OVERRIDE")
+        
+        if test_hour_str and test_hour_str.isdigit():
+            print(f"--- RUNNING IN TEST MODE FOR HOUR: {test_hour_str} ---")
+            current_hour = int(test_hour_str)
+            run_id = f"test-{datetime.datetime.now(IST).isoformat(timespec='seconds')}" # Test runs always send
+        else:
+            current_hour = datetime.datetime.now(IST).hour
+            run_id = None
+
+        print(f"Script logic is running for hour: {current_hour} (IST)")
+        run_scheduled_action(current_hour, run_id)
@@ -0,0 +1,245 @@
+# --- outbox.py ---
+# Durable local outbox for notifications: a small SQLite file the notifier
+# enqueues into and a drain worker sends from. A message is only dropped after
+# MAX_ATTEMPTS failed tries, so provider throttling or an outage delays pings
+# instead of losing them.
+#
+#   * Idempotency: every message carries a key (e.g. "eod:2026-10-18:Hunter").
+#     Enqueueing a key that is already in the outbox is a no-op, so a cron slot
+#     that runs twice never sends twice.
+#   * Retries: a failed send is rescheduled with exponential backoff plus jitter.
+#   * Leases: claimed messages are locked for LEASE_SECONDS. If the sender dies
+#     mid-batch, they become due again.
+#   * Batching: messages are claimed CLAIM_BATCH at a time and their outcomes
+#     written back in one transaction. Messages due for the same channel and
+#     recipient are coalesced into one send, up to COALESCE_MAX_CHARS[channel]
+#     per body. Keys starting with a NO_COALESCE_PREFIXES entry (the per-hunter
+#     EOD reports) are always sent on their own.
+#   * Concurrency: at most CHANNEL_CONCURRENCY[channel] sends in flight per channel.
+#
+# metrics() reports queue depth and delivery latency (enqueue -> sent).
+
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+OUTBOX_PATH = os.environ.get("NOTIFIER_OUTBOX", "notifier_outbox.db")
+MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE = 2.0  # Seconds before the first retry; doubles with every failed attempt (with jitter)
+BACKOFF_MAX = 900.0
+LEASE_SECONDS = 120
+CLAIM_BATCH = 50
+CHANNEL_CONCURRENCY = {"ntfy": 8, "whatsapp": 4}
+COALESCE_SEPARATOR = "\n\n---\n\n"
+COALESCE_MAX_CHARS = {"ntfy": 4096, "whatsapp": 1600}  # Provider body limits (Twilio rejects WhatsApp bodies over 1600)
+NO_COALESCE_PREFIXES = ("eod:",)
+
+DrainResult = namedtuple("DrainResult", "sent failed dead send_ms")
+
+
+def backoff_seconds(attempts):
+    """Delay before retry number `attempts` (1-based): full jitter over an exponentially growing window."""
+    return random.uniform(0.5, 1.0) * min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+
+
+def group_sends(rows):
+    """Splits claimed rows into sends: same channel and recipient, each coalesced body within its channel's limit."""
+    groups, open_groups = [], {}
+    for row in rows:
+        if row["key"].startswith(NO_COALESCE_PREFIXES):
+            groups.append([row])
+            continue
+        target = (row["channel"], row["recipient"])
+        size = len(row["title"]) + 1 + len(row["body"])
+        group = open_groups.get(target)
+        limit = COALESCE_MAX_CHARS.get(row["channel"])
+        if group is not None and (limit is None or group[1] + len(COALESCE_SEPARATOR) + size <= limit):
+            group[0].append(row)
+            group[1] += len(COALESCE_SEPARATOR) + size
+        else:
+            open_groups[target] = group = [[row], size]
+            groups.append(group[0])
+    return groups
+
+
+def coalesce(rows):
+    """(title, body, tags) of one send covering every message in `rows` (same channel and recipient)."""
+    if len(rows) == 1:
+        return rows[0]["title"], rows[0]["body"], rows[0]["tags"]
+    title = f"{rows[0]['title']} (+{len(rows) - 1} more)"
+    body = COALESCE_SEPARATOR.join(f"{row['title']}\n{row['body']}" for row in rows)
+    return title, body, rows[0]["tags"]
+
+
+class Outbox:
+    """SQLite-backed message queue (WAL mode, one connection per thread)."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS outbox ("
+        " id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, channel TEXT NOT NULL, recipient TEXT,"
+        " title TEXT NOT NULL, body TEXT NOT NULL, tags TEXT NOT NULL DEFAULT '',"
+        " status TEXT NOT NULL DEFAULT 'pending',"  # pending | sending | sent | dead
+        " attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, enqueued_at REAL NOT NULL,"
+        " sent_at REAL, last_error TEXT)",
+        "CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)",
+    )
+    COLUMNS = ("id", "key", "channel", "recipient", "title", "body", "tags", "attempts", "enqueued_at")
+
+    def __init__(self, path=None):
+        self.path = path or OUTBOX_PATH
+        self._local = threading.local()
+        conn = self._conn()
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- producer side ---
+    def enqueue(self, key, channel, recipient, title, body, tags=""):
+        """Adds a message unless its idempotency key is already in the outbox. Returns True if it was added."""
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT OR IGNORE INTO outbox (key, channel, recipient, title, body, tags, next_attempt_at, enqueued_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (key, channel, recipient, title, body, tags, now, now))
+        return cursor.rowcount == 1
+
+    # --- consumer side ---
+    def claim(self, limit=CLAIM_BATCH, now=None):
+        """Leases up to `limit` due messages (oldest first), including ones whose earlier lease expired."""
+        now = now or time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM outbox"
+                " WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?"
+                " ORDER BY next_attempt_at, id LIMIT ?", (now, limit)).fetchall()
+            conn.executemany("UPDATE outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+                             [(now + LEASE_SECONDS, row[0]) for row in rows])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def settle(self, sent_ids, failures, now=None):
+        """Records a batch's outcomes in one transaction. failures: [(row, error)]. Returns how many went dead."""
+        now = now or time.time()
+        dead = 0
+        retries = []
+        for row, error in failures:
+            attempts = row["attempts"] + 1
+            if attempts >= MAX_ATTEMPTS:
+                dead += 1
+                retries.append(("dead", attempts, now, error, row["id"]))
+            else:
+                retries.append(("pending", attempts, now + backoff_seconds(attempts), error, row["id"]))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = ? WHERE id = ?",
+                             [(now, message_id) for message_id in sent_ids])
+            conn.executemany("UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                             retries)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return dead
+
+    def next_due(self):
+        """When the next unsent message becomes due (epoch seconds), or None if nothing is waiting."""
+        row = self._conn().execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE status IN ('pending', 'sending')").fetchone()
+        return row[0]
+
+    def drain(self, senders, concurrency=None, limiter=None, deadline=None):
+        """Sends due messages until none are left. Returns a DrainResult.
+
+        senders: {channel: fn(recipient, title, body, tags) -> bool}. limiter: optional object whose
+        wait() is called before every send (a rate limit). deadline: epoch seconds to keep waiting for
+        messages in backoff; None returns as soon as nothing is due right now.
+        """
+        limits = {**CHANNEL_CONCURRENCY, **(concurrency or {})}
+        slots = {channel: threading.BoundedSemaphore(limit) for channel, limit in limits.items()}
+        sent = failed = dead = 0
+        send_ms = []
+
+        def send(rows):
+            channel, recipient = rows[0]["channel"], rows[0]["recipient"]
+            sender = senders.get(channel)
+            if sender is None:
+                return rows, False, 0.0, f"no sender for channel {channel!r}"
+            title, body, tags = coalesce(rows)
+            with slots.setdefault(channel, threading.BoundedSemaphore(1)):
+                if limiter is not None:
+                    limiter.wait()
+                started = time.perf_counter()
+                try:
+                    ok, error = bool(sender(recipient, title, body, tags)), "send failed"
+                except Exception as e:
+                    ok, error = False, str(e)
+                return rows, ok, time.perf_counter() - started, error
+
+        with ThreadPoolExecutor(max_workers=max(1, sum(limits.values()))) as pool:
+            while True:
+                batch = self.claim()
+                if not batch:
+                    due = self.next_due()
+                    if due is None or deadline is None or due > deadline:
+                        break
+                    time.sleep(max(0.0, min(due, deadline) - time.time()))
+                    continue
+                sent_ids, failures = [], []
+                for rows, ok, seconds, error in pool.map(send, group_sends(batch)):
+                    send_ms.append(seconds * 1000)
+                    if ok:
+                        sent_ids += [row["id"] for row in rows]
+                    else:
+                        failures += [(row, error) for row in rows]
+                dead += self.settle(sent_ids, failures)
+                sent += len(sent_ids)
+                failed += len(failures)
+        return DrainResult(sent, failed, dead, send_ms)
+
+    # --- metrics ---
+    def metrics(self, window_s=86400):
+        """Queue depth by status, age of the oldest waiting message, and delivery latency over the last `window_s`."""
+        conn = self._conn()
+        now = time.time()
+        by_status = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        oldest = conn.execute("SELECT MIN(enqueued_at) FROM outbox WHERE status IN ('pending', 'sending')").fetchone()[0]
+        delivered = conn.execute(
+            "SELECT (sent_at - enqueued_at) * 1000, attempts FROM outbox WHERE status = 'sent' AND sent_at >= ?"
+            " ORDER BY 1", (now - window_s,)).fetchall()
+        latencies = [ms for ms, _ in delivered]
+
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 1) if latencies else 0.0
+
+        return {
+            "depth": by_status.get("pending", 0) + by_status.get("sending", 0),
+            "by_status": by_status,
+            "oldest_waiting_s": round(now - oldest, 1) if oldest else 0.0,
+            "delivered": len(delivered),
+            "retried": sum(1 for _, attempts in delivered if attempts > 1),
+            "delivery_p50_ms": pct(50), "delivery_p95_ms": pct(95), "delivery_max_ms": pct(100),
+        }
+
+    def dead_letters(self, limit=50):
+        """The most recent messages that ran out of attempts, with their last error."""
+        rows = self._conn().execute(
+            "SELECT key, channel, recipient, title, attempts, last_error FROM outbox WHERE status = 'dead'"
+            " ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(zip(("key", "channel", "recipient", "title", "attempts", "last_error"), row)) for row in rows]
@@ -2,10 +2,12 @@
 
 import streamlit as st
 # Access the tools from the core system
-from core_system import STORE_ITEMS, initialize_firebase, daily_reset_and_check, save_data
+from core_system import STORE_ITEMS, get_storage, daily_reset_and_check, save_data, purchase_item, \
+    begin_rerun, end_rerun, flush_writes, commit_and_rerun, show_commit_counter
 
 st.set_page_config(page_title="Hunter Store", layout="wide")
-initialize_firebase() # Connect to Firebase
+begin_rerun("Hunter Store")
+get_storage() # Connect to storage
 daily_reset_and_check() # Ensure state is current and reset runs
 
 hunter = st.session_state.hunter
@@ -26,17 +28,17 @@ for i, (key, item) in enumerate(STORE_ITEMS.items()):
         
         can_afford = hunter['gold'] >= item['cost']
         
-        if st.button(f"Purchase '{item['name']}'", key=key, disabled=not can_afford, use_container_width=True):
-            if can_afford:
-                hunter['gold'] -= item['cost']
-                
-                # Penalty: Reduce Willpower
-                hunter['stats']['wil'] = max(1, hunter['stats']['wil'] - 1)
+        if st.button(f"Purchase '{item['name']}'", key=key, disabled=not can_afford, width="stretch"):
+            if purchase_item(key): # Gold cost plus the Willpower penalty, as one ledger event
                 st.info("Your Willpower (WIL) stat decreased by 1.")
                 
                 st.success(f"PURCHASE SUCCESSFUL: You bought '{item['name']}'. -{item['cost']} Gold.")
                 
                 save_data()
-                st.rerun()
+                commit_and_rerun()
             else:
-                st.error("INSUFFICIENT GOLD.")
\ No newline at end of file
+                st.error("INSUFFICIENT GOLD.")
+
+flush_writes()
+show_commit_counter()
+end_rerun()
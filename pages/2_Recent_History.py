@@ -3,18 +3,23 @@
 import streamlit as st
 import pandas as pd
 # Access all data and functions from the core system
-from core_system import initialize_firebase, daily_reset_and_check, load_history_data, QUESTS
+from core_system import get_storage, daily_reset_and_check, load_history_data, has_more_history, get_catalog, \
+    get_history_day, history_cache_stats, load_history_analytics, load_current_rollups, HISTORY_PAGE_SIZE, begin_rerun, end_rerun, flush_writes, show_commit_counter
 
 st.set_page_config(page_title="History Log", layout="wide")
-initialize_firebase() 
+begin_rerun("Recent History")
+get_storage()
 daily_reset_and_check()
+flush_writes() # Commit the daily reset (if any) before reading history
 hunter = st.session_state.hunter
 
 st.title("Recent History Log 📜 (Performance Dashboard)")
 st.markdown("---")
 
-# Load last 30 days
-history_df = load_history_data(limit=30) 
+# Load the latest days (30 at first; "Load older days" pages further back)
+if 'history_days_shown' not in st.session_state:
+    st.session_state.history_days_shown = HISTORY_PAGE_SIZE
+history_df = load_history_data(limit=st.session_state.history_days_shown) 
 
 if not history_df.empty:
     
@@ -61,7 +66,11 @@ if not history_df.empty:
     styled_df = summary_df.style.apply(style_performance, axis=1)
 
     # Display the styled DataFrame
-    st.dataframe(styled_df, use_container_width=True, hide_index=True)
+    st.dataframe(styled_df, width="stretch", hide_index=True)
+
+    if has_more_history() and st.button("Load older days"):
+        st.session_state.history_days_shown += HISTORY_PAGE_SIZE
+        st.rerun()
 
     st.markdown("---")
 
@@ -69,23 +78,22 @@ if not history_df.empty:
     st.subheader("Daily Quest Details")
     
     dates = summary_df['Date'].tolist()
-    # Select latest date by default
-    selected_date = st.selectbox("Select a Date to view details:", dates, index=len(dates)-1)
+    # Select latest date by default (the table is newest first)
+    selected_date = st.selectbox("Select a Date to view details:", dates, index=0)
     
     if selected_date:
-        db = initialize_firebase()
-        doc_ref = db.collection('hunters').document(hunter['name']).collection('history').document(selected_date)
-        doc = doc_ref.get()
+        # Served from the history loader's in-memory day cache (no extra read)
+        day_data = get_history_day(selected_date)
         
-        if doc.exists:
-            day_data = doc.to_dict()
+        if day_data is not None:
             completed_keys = set(day_data.get('completed_quests', []))
             
             st.markdown(f"#### Quests Completed on {selected_date}")
             
+            quests = get_catalog()
             completed_names = []
-            for key in completed_keys:
-                quest_info = QUESTS.get(key, {})
+            for key in quests.sort_keys(completed_keys): # Same order as the dashboard
+                quest_info = quests.get(key, {})
                 quest_name = quest_info.get('name', f"Unknown Quest ({key})")
                 completed_names.append(quest_name)
             
@@ -95,5 +103,45 @@ if not history_df.empty:
             else:
                 st.warning("No quests were logged on this day.")
 
+    # --- ANALYTICS (whole history, not just the days in the table) ---
+    st.markdown("---")
+    st.subheader("📈 Analytics")
+    periods = load_current_rollups()
+    for col, (label, rollup) in zip(st.columns(2), (("This Week", periods['week']), ("This Month", periods['month']))):
+        col.markdown(f"**{label}**")
+        col.caption(f"{rollup.get('quests_completed', 0)} quests · +{rollup.get('xp_earned', 0)} XP · "
+                    f"+{rollup.get('levels_gained', 0)} levels · +{rollup.get('gold_earned', 0)} / "
+                    f"-{rollup.get('gold_spent', 0)} G · {rollup.get('mandatory_missed_days', 0)} day(s) missed")
+
+    stats = load_history_analytics()
+    if stats:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Current Streak", f"{stats['current_streak']} days", help="Days in a row with every mandatory quest done")
+        col2.metric("Best Streak", f"{stats['best_streak']} days")
+        col3.metric("XP / Day (7d)", f"{stats['xp_per_day_7']:.0f}", delta=f"{stats['xp_per_day_7'] - stats['xp_per_day_30']:.0f} vs 30d")
+        col4.metric("Gold / Day (7d)", f"{stats['gold_per_day_7']:.1f}", delta=f"{stats['gold_per_day_7'] - stats['gold_per_day_30']:.1f} vs 30d")
+
+        st.markdown(f"**Completion Rate** (daily quests, {stats['days_tracked']} days tracked)")
+        rates_df = pd.DataFrame({
+            '7-day': stats['rolling_7'] * 100,
+            '30-day': stats['rolling_30'] * 100,
+        }, index=pd.to_datetime(stats['dates']))
+        st.line_chart(rates_df.tail(365), y_label="% completed")
+
+        st.markdown("**Quest Adherence** (share of all tracked days)")
+        quests = get_catalog()
+        adherence_df = pd.DataFrame({
+            'Quest': [quests[key]['name'] for key in stats['adherence']],
+            'Adherence %': [rate * 100 for rate in stats['adherence'].values()],
+        }).sort_values('Adherence %', ascending=False)
+        st.dataframe(adherence_df, hide_index=True, width="stretch",
+                     column_config={'Adherence %': st.column_config.ProgressColumn(format="%.0f%%", min_value=0, max_value=100)})
+
+    cache_stats = history_cache_stats()
+    st.caption(f"Day cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+
 else:
-    st.info("No history data found. Start completing quests on the main page to see your log!")
\ No newline at end of file
+    st.info("No history data found. Start completing quests on the main page to see your log!")
+
+show_commit_counter()
+end_rerun()
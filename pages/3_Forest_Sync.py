@@ -1,73 +1,58 @@
 # --- pages/3_Forest_Sync.py ---
 
 import streamlit as st
-import pandas as pd
-from core_system import initialize_firebase, daily_reset_and_check, save_data, check_for_level_up, QUESTS
+from core_system import get_storage, daily_reset_and_check, get_catalog, import_forest_export, evaluate_weekly_focus, \
+    DEEP_FOCUS_QUEST_KEY, begin_rerun, end_rerun, flush_writes, show_commit_counter
 
 st.set_page_config(page_title="Forest Sync", layout="centered")
-initialize_firebase() 
+begin_rerun("Forest Sync")
+get_storage()
 daily_reset_and_check()
 hunter = st.session_state.hunter
 
-DEEP_FOCUS_QUEST_KEY = "deep_focus_weekly"
-HOURS_TARGET = 8 
+quest = get_catalog()[DEEP_FOCUS_QUEST_KEY]
+HOURS_TARGET = quest.get('target_hours', 8)
 
 st.title("Forest App Sync 🌲 (Weekly Focus Log)")
-st.info(f"Log your focused hours to complete the **'{QUESTS[DEEP_FOCUS_QUEST_KEY]['name']}'** quest.")
+st.info(f"Import your Forest sessions to complete the **'{quest['name']}'** quest.")
 st.markdown("---")
 
-# --- Step 1: Manual Data Entry ---
-st.subheader("1. Enter This Week's Focused Hours")
+# --- Step 1: Import the Forest export ---
+st.subheader("1. Import Your Forest Export")
 
-# We use a text input because the hours can be floating points (e.g., 8.5 hours)
-hours_logged = st.number_input(
-    "Total Focused Hours (from Forest App this week):",
-    min_value=0.0,
-    value=st.session_state.hunter.get('weekly_focus_hours', 0.0), # Maintain previous value
-    step=0.1,
-    format="%.1f"
-)
+uploaded = st.file_uploader("Forest session export (CSV from Forest → Settings → Export Data)", type="csv")
+if uploaded is not None and st.button("Import Sessions", width="stretch"):
+    try:
+        result = import_forest_export(uploaded)
+    except (ValueError, KeyError) as e:
+        st.error(f"Could not read this file as a Forest export: {e}")
+    else:
+        untracked = (f", {result.untracked} from before {hunter['forest_tracked_since'].replace('T', ' ')} "
+                     "(imported before each session was tracked)" if result.untracked else "")
+        st.success(f"Imported {result.sessions} new session(s) across {len(result.week_hours)} week(s). "
+                   f"Skipped {result.duplicates} already imported{untracked} and {result.failed} withered.")
 
-# Store the value temporarily in the session state
-st.session_state.hunter['weekly_focus_hours'] = hours_logged
+if hunter.get('forest_last_session'):
+    st.caption(f"Newest imported session: {hunter['forest_last_session'].replace('T', ' ')}.")
 
 
-# --- Step 2: Log Progress Button ---
-st.subheader("2. Check & Log Progress")
-quest = QUESTS[DEEP_FOCUS_QUEST_KEY]
+# --- Step 2: This week's progress (evaluated automatically) ---
+st.subheader("2. This Week's Progress")
 
-if st.session_state.hunter['weekly_focus_hours'] >= HOURS_TARGET:
-    
-    completion_percent = min(100, int((hours_logged / HOURS_TARGET) * 100))
-    st.success(f"Goal Reached! {hours_logged} hours logged. Completion: {completion_percent}%")
+evaluate_weekly_focus() # Awards the quest once the hours are in; also starts a fresh week when the ISO week changes
 
-    if st.button("Log Weekly Focus Reward (100%)", use_container_width=True):
-        
-        # Calculate rewards based on 100% completion
-        xp_gained = quest['xp']
-        gold_gained = quest['gold']
-        
-        # Update stats
-        stat, points = quest['stat_bonus']
-        hunter['stats'][stat] += points
-        
-        hunter['xp'] += xp_gained
-        hunter['gold'] += gold_gained
-        
-        st.success(f"Weekly Deep Focus Quest COMPLETED! +{xp_gained} XP, +{gold_gained} G, +{points} {stat.upper()}.")
-        
-        # Reset the weekly tracker to 0 for the next week
-        st.session_state.hunter['weekly_focus_hours'] = 0.0
-        
-        # NOTE: Since this is a weekly quest, we don't add it to completed_daily_quests
-        
-        check_for_level_up()
-        save_data()
-        st.rerun()
+hours_logged = hunter['weekly_focus_hours']
+st.progress(min(1.0, hours_logged / HOURS_TARGET), text=f"{hours_logged:.1f} / {HOURS_TARGET} hours (week of {hunter['focus_week']})")
 
+if hunter.get('deep_focus_claimed_week') == hunter['focus_week']:
+    st.success(f"Goal Reached! Weekly quest completed: +{quest['xp']} XP, +{quest['gold']} G.")
 else:
     remaining_hours = max(0, HOURS_TARGET - hours_logged)
     st.warning(f"Keep Growing! You need {remaining_hours:.1f} more hours to complete the weekly quest.")
 
 st.markdown("---")
-st.markdown("*Tip: Export your Forest log at the end of the week, sum the hours, and enter the total here!*")
\ No newline at end of file
+st.markdown("*Tip: Export your Forest data whenever you like. Sessions you already imported are skipped, so re-uploading the full export is fine.*")
+
+flush_writes()
+show_commit_counter()
+end_rerun()
@@ -0,0 +1,78 @@
+# --- pages/4_Diagnostics.py ---
+# Storage calls and rerun latency, from the instrumentation ring buffers (see instrumentation.py).
+
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import instrumentation
+from core_system import get_storage
+
+st.set_page_config(page_title="Diagnostics", layout="wide")
+get_storage() # Not a game page: its own reruns are not recorded
+
+st.title("Diagnostics 🩺")
+st.caption(f"Last {instrumentation.CALLS_KEPT} calls and {instrumentation.RERUNS_KEPT} page reruns of this server process, "
+           "across all sessions. Times are wall-clock milliseconds; sizes are JSON bytes.")
+
+if not instrumentation.ENABLED:
+    st.warning("Instrumentation is off (SOLO_INSTRUMENTATION=0).")
+
+ctx = get_script_run_ctx()
+only_mine = st.toggle("Only this session", value=False)
+reruns = instrumentation.reruns()
+calls = instrumentation.calls()
+if only_mine and ctx:
+    reruns = [r for r in reruns if r["session"] == ctx.session_id]
+    mine = {r["id"] for r in reruns}
+    calls = [c for c in calls if c["rerun"] in mine]
+
+if not calls and not reruns:
+    st.info("Nothing recorded yet. Open the game pages and come back.")
+    st.stop()
+
+# --- Per-rerun totals ---
+st.subheader("Page Reruns")
+if reruns:
+    st.dataframe(pd.DataFrame(instrumentation.rerun_summary(reruns)), hide_index=True, width="stretch")
+
+    st.markdown("**Most expensive reruns**")
+    slowest = pd.DataFrame(instrumentation.slowest_reruns(10, reruns))
+    slowest["at"] = pd.to_datetime(slowest["at"], unit="s").dt.strftime("%H:%M:%S")
+    st.dataframe(slowest[["id", "page", "at", "ms", "complete", "calls", "storage_reads", "storage_writes",
+                          "docs_read", "docs_written", "bytes_read", "bytes_written"]],
+                 hide_index=True, width="stretch",
+                 column_config={"ms": st.column_config.NumberColumn("ms", format="%.1f")})
+
+    rerun_id = st.selectbox("Calls of rerun", options=list(slowest["id"]))
+    breakdown = [c for c in calls if c["rerun"] == rerun_id]
+    if breakdown:
+        st.dataframe(pd.DataFrame(breakdown)[["name", "ms", "docs", "bytes"]], hide_index=True, width="stretch",
+                     column_config={"ms": st.column_config.NumberColumn("ms", format="%.2f")})
+else:
+    st.caption("No page reruns recorded yet.")
+
+# --- Per-call latency ---
+st.subheader("Calls")
+if calls:
+    summary = pd.DataFrame(instrumentation.call_summary(calls))
+    st.dataframe(summary, hide_index=True, width="stretch")
+    storage_calls = summary[summary["name"].str.startswith("storage.")]
+    st.caption(f"Storage: {int(storage_calls['calls'].sum())} round trips, {int(storage_calls['docs'].sum())} documents, "
+               f"{storage_calls['bytes'].sum() / 1024:.1f} KiB.")
+
+# --- Export for offline profiling ---
+st.subheader("Export")
+stamp = time.strftime("%Y%m%d-%H%M%S")
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.download_button("Download JSON (calls + reruns)", instrumentation.export("json"),
+                       file_name=f"diagnostics-{stamp}.json", mime="application/json", width="stretch")
+with col2:
+    st.download_button("Download CSV (calls)", instrumentation.export("csv"),
+                       file_name=f"diagnostics-calls-{stamp}.csv", mime="text/csv", width="stretch")
+with col3:
+    if st.button("Clear buffers", width="stretch"):
+        instrumentation.reset()
+        st.rerun()
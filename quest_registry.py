@@ -0,0 +1,102 @@
+# --- quest_registry.py ---
+# Quest definitions live in quests.json. They are compiled once into a
+# QuestCatalog: ordered quest list, ordinal IDs, mandatory / weekly sets,
+# per-stat groups and totals. Every consumer reads those views instead of
+# recomputing them. Editing the file takes effect on the next get_catalog()
+# call; no restart is needed.
+
+import json
+import os
+import threading
+
+QUESTS_FILE = os.environ.get("SOLO_QUESTS_FILE",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "quests.json"))
+
+
+class QuestCatalog:
+    """Read-only, precomputed views over one version of the quest definitions."""
+
+    def __init__(self, quests, mtime=None):
+        self.mtime = mtime
+        self.quests = {}
+        for key, quest in quests.items():
+            for field in ("name", "xp", "gold", "stat_bonus"):
+                if field not in quest:
+                    raise ValueError(f"Quest '{key}' is missing '{field}'")
+            self.quests[key] = {**quest, "stat_bonus": tuple(quest["stat_bonus"])}
+
+        self.keys = tuple(self.quests)                                  # Definition order
+        self.ordinal = {key: i for i, key in enumerate(self.keys)}      # Stable small ints for sorting / arrays
+        self.mandatory = frozenset(k for k, q in self.quests.items() if q.get("is_mandatory"))
+        self.weekly = frozenset(k for k, q in self.quests.items() if q.get("is_weekly"))
+        self.daily_keys = tuple(k for k in self.keys if k not in self.weekly)
+
+        by_stat = {}
+        for key in self.keys:
+            by_stat.setdefault(self.quests[key]["stat_bonus"][0], []).append(key)
+        self.by_stat = {stat: tuple(keys) for stat, keys in by_stat.items()}
+
+        self.total = len(self.keys)
+        self.daily_total = len(self.daily_keys)
+
+    def __getitem__(self, key):
+        return self.quests[key]
+
+    def __contains__(self, key):
+        return key in self.quests
+
+    def get(self, key, default=None):
+        return self.quests.get(key, default)
+
+    def items(self):
+        return self.quests.items()
+
+    def mandatory_missed(self, completed):
+        """True if any mandatory quest is absent from `completed`."""
+        return not self.mandatory.issubset(completed)
+
+    def sort_keys(self, keys):
+        """Sorts quest keys into catalog order; unknown keys go last, alphabetically."""
+        return sorted(keys, key=lambda k: (self.ordinal.get(k, self.total), k))
+
+
+def load_catalog(path=None):
+    """Reads and compiles a quest file (quests.json unless `path` is given)."""
+    with open(path or QUESTS_FILE, encoding="utf-8") as f:
+        mtime = os.fstat(f.fileno()).st_mtime_ns
+        data = json.load(f)
+    return QuestCatalog(data["quests"], mtime=mtime)
+
+
+_catalog = None
+_failed_mtime = None # mtime of a quests.json that failed to load; retried only once the file changes again
+_lock = threading.Lock()
+
+
+def get_catalog():
+    """Returns the compiled catalog, recompiling it if quests.json changed since the last call.
+
+    A broken edit keeps the previous catalog in service (and logs why) rather than taking the app down.
+    """
+    global _catalog, _failed_mtime
+    try:
+        mtime = os.stat(QUESTS_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    catalog = _catalog
+    if catalog is not None and (mtime is None or mtime in (catalog.mtime, _failed_mtime)):
+        return catalog
+
+    with _lock:
+        if _catalog is not None and mtime in (_catalog.mtime, _failed_mtime):
+            return _catalog
+        try:
+            _catalog = load_catalog()
+            if catalog is not None:
+                print(f"[Quests] Reloaded {_catalog.total} quests from {QUESTS_FILE}")
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            if _catalog is None:
+                raise
+            _failed_mtime = mtime
+            print(f"[Quests] Keeping the previous catalog; could not reload {QUESTS_FILE}: {e}")
+        return _catalog
@@ -0,0 +1,114 @@
+# --- rollups.py ---
+# Weekly and monthly rollup documents (hunters/<name>/rollups/<id>), kept up to
+# date at write time. They are derived from the ledger events (see ledger.py)
+# a commit appends: each event becomes increments on the week and month it
+# belongs to, written in the same batch, so an event dropped or renumbered by a
+# concurrent-session rebase is never counted twice. Summaries then read two
+# small documents instead of streaming every history day.
+#
+#   week-2026-W42 / month-2026-10:
+#     period, start                       'week' | 'month', first day of the period
+#     quests_completed, quest_tallies.*   quest completions logged
+#     xp_earned, levels_gained
+#     gold_earned, gold_spent             gold gained / spent through play (penalties excluded)
+#     days_closed, mandatory_missed_days, gold_penalty   from the day-close events
+#     focus_hours                         (weeks only) Forest focus time, from focus_logged events
+
+from datetime import date
+
+from ledger import event_dates
+from storage import Increment
+
+ROLLUP_COLLECTION = "rollups"
+
+
+def week_id(day):
+    year, week, _ = day.isocalendar()
+    return f"week-{year}-W{week:02d}"
+
+
+def month_id(day):
+    return f"month-{day.year}-{day.month:02d}"
+
+
+def week_doc(day):
+    """(doc_id, header fields) of the week rollup a date belongs to."""
+    year, week, _ = day.isocalendar()
+    return week_id(day), {'period': 'week', 'start': date.fromisocalendar(year, week, 1).isoformat()}
+
+
+def rollup_docs(date_str):
+    """(doc_id, header fields) of the week and month rollups a date belongs to."""
+    day = date.fromisoformat(date_str)
+    return [week_doc(day), (month_id(day), {'period': 'month', 'start': day.replace(day=1).isoformat()})]
+
+
+def event_increments(event):
+    """Yields (doc_id, header fields, increments) for every rollup a ledger event counts towards."""
+    kind = event['type']
+    if kind == 'focus_logged':
+        for week_start, hours in event['week_hours'].items():
+            doc_id, header = week_doc(date.fromisoformat(week_start))
+            yield doc_id, header, {'focus_hours': Increment(hours)}
+        return
+
+    if kind == 'quest_logged':
+        day, fields = event['at'][:10], {'quests_completed': Increment(1),
+                                         'quest_tallies': {event['quest']: Increment(1)}}
+        if event['xp']:
+            fields['xp_earned'] = Increment(event['xp'])
+        if event['gold']:
+            fields['gold_earned'] = Increment(event['gold'])
+    elif kind == 'level_up':
+        day, fields = event['at'][:10], {'levels_gained': Increment(event.get('levels', 1))}
+    elif kind == 'purchase':
+        day, fields = event['at'][:10], {'gold_spent': Increment(event['cost'])}
+    elif kind in ('penalty', 'day_closed') and 'through' in event:
+        yield from _run_increments(event) # A run of skipped days
+        return
+    elif kind == 'penalty':
+        day, fields = event['date'], {'gold_penalty': Increment(event['gold'])}
+    elif kind == 'day_closed':
+        day, fields = event['date'], {'days_closed': Increment(1)}
+        if event['missed']:
+            fields['mandatory_missed_days'] = Increment(1)
+    else:
+        return
+    for doc_id, header in rollup_docs(day):
+        yield doc_id, header, fields
+
+
+def _run_increments(event):
+    """Increments of a day_closed or penalty event covering a run of days, summed per rollup document.
+
+    A run's penalty took up to `daily` gold per day, oldest day first, until the total was reached.
+    """
+    docs = {}
+    remaining = event.get('gold', 0)
+    for day in event_dates(event):
+        if event['type'] == 'penalty':
+            gold, remaining = min(remaining, event['daily']), remaining - min(remaining, event['daily'])
+            if not gold:
+                break
+            fields = {'gold_penalty': Increment(gold)}
+        else:
+            fields = {'days_closed': Increment(1)}
+            if event['missed']:
+                fields['mandatory_missed_days'] = Increment(1)
+        for doc_id, header in rollup_docs(day):
+            add_fields(docs.setdefault(doc_id, [header, {}])[1], fields)
+    for doc_id, (header, fields) in docs.items():
+        yield doc_id, header, fields
+
+
+def add_fields(target, fields):
+    """Folds rollup fields into a staged write in place, summing Increments (nested dicts included)."""
+    for key, value in fields.items():
+        current = target.get(key)
+        if isinstance(value, Increment) and isinstance(current, Increment):
+            target[key] = Increment(current.amount + value.amount)
+        elif isinstance(value, dict) and isinstance(current, dict):
+            add_fields(current, value)
+        else:
+            target[key] = dict(value) if isinstance(value, dict) else value
+    return target
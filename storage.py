@@ -0,0 +1,443 @@
+# --- storage.py ---
+# One small storage interface for the game, with three interchangeable backends:
+#   * FirestoreStorage - the production Google Firestore database
+#   * SQLiteStorage    - an embedded, local, low-latency file database (WAL mode)
+#   * MemoryStorage    - an in-process dict, for benchmarks and offline runs
+#
+# Layout mirrors Firestore: hunters/<name> documents, each with sub-collections
+# of documents (history/<YYYY-MM-DD>, ...). Document IDs sort chronologically.
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+# Backend-neutral write sentinels (Firestore backend translates them to its own)
+Increment = namedtuple("Increment", ["amount"])
+DELETE = object()
+
+FIRESTORE_BATCH_LIMIT = 500  # Max writes Firestore accepts in one commit
+GET_ALL_CHUNK = 300  # Documents fetched per bulk-read round trip
+
+
+class StorageBackend:
+    """The storage operations the game uses. Backends implement the reads and _commit()."""
+
+    # --- hunters ---
+    def get_hunter(self, name):
+        """Returns the hunter document as a dict, or None."""
+        raise NotImplementedError
+
+    def list_hunters(self):
+        """Returns the names of every hunter document."""
+        raise NotImplementedError
+
+    def get_hunters(self, names):
+        """Bulk get: returns {name: data or None} for many hunters in as few round trips as the engine allows."""
+        return {name: self.get_hunter(name) for name in names}
+
+    def set_hunter(self, name, data):
+        """Creates or replaces a hunter document."""
+        self.batch().set_hunter(name, data).commit()
+
+    # --- sub-collection documents ---
+    def get_doc(self, name, collection, doc_id):
+        """Returns one sub-collection document as a dict, or None."""
+        raise NotImplementedError
+
+    def get_docs(self, keys):
+        """Bulk get of sub-collection documents: returns {(name, collection, doc_id): data or None}."""
+        return {key: self.get_doc(*key) for key in keys}
+
+    def set_doc(self, name, collection, doc_id, data, merge=False):
+        """Writes one sub-collection document (merge=True merges into what is there)."""
+        self.batch().set_doc(name, collection, doc_id, data, merge=merge).commit()
+
+    def stream_docs(self, name, collection, descending=False, start_after=None, start_at=None, limit=None):
+        """Yields (doc_id, data) ordered by document ID, optionally from a cursor and limited."""
+        raise NotImplementedError
+
+    # --- history convenience wrappers ---
+    def set_history(self, name, date_str, data, merge=True):
+        self.set_doc(name, "history", date_str, data, merge=merge)
+
+    def get_history_day(self, name, date_str):
+        return self.get_doc(name, "history", date_str)
+
+    def stream_history(self, name, **query):
+        return self.stream_docs(name, "history", **query)
+
+    # --- batched writes ---
+    def batch(self):
+        """Returns a WriteBatch; nothing is written until its commit()."""
+        return WriteBatch(self)
+
+    def _commit(self, ops):
+        """Applies a list of write ops atomically. See WriteBatch for the op shapes."""
+        raise NotImplementedError
+
+
+class WriteBatch:
+    """Collects writes and sends them to the backend in one atomic commit."""
+
+    def __init__(self, backend):
+        self._backend = backend
+        self.ops = []
+
+    def set_hunter(self, name, data):
+        self.ops.append(("set_hunter", name, None, None, data, False))
+        return self
+
+    def set_doc(self, name, collection, doc_id, data, merge=False):
+        self.ops.append(("set_doc", name, collection, doc_id, data, merge))
+        return self
+
+    def set_history(self, name, date_str, data, merge=True):
+        return self.set_doc(name, "history", date_str, data, merge=merge)
+
+    def create_doc(self, name, collection, doc_id, data):
+        """Writes a document that must not exist yet; if it does, the whole commit fails with WriteConflict."""
+        self.ops.append(("create_doc", name, collection, doc_id, data, False))
+        return self
+
+    def __len__(self):
+        return len(self.ops)
+
+    def commit(self):
+        if self.ops:
+            self._backend._commit(self.ops)
+        self.ops = []
+
+
+# --- helpers shared by the local backends ---
+def _resolve(current, value):
+    """Applies a write sentinel to the current value of a field."""
+    if isinstance(value, Increment):
+        return (current if isinstance(current, (int, float)) else 0) + value.amount
+    if isinstance(value, dict):
+        return {k: _resolve(None, v) for k, v in value.items() if v is not DELETE}
+    return copy.deepcopy(value)
+
+
+def _merge(target, data):
+    """Deep-merges `data` into `target` the way Firestore's set(merge=True) does."""
+    for key, value in data.items():
+        if value is DELETE:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = _resolve(target.get(key), value)
+    return target
+
+
+def _apply_doc_write(current, data, merge):
+    if merge and current is not None:
+        return _merge(current, data)
+    return _merge({}, data)
+
+
+def _select_ids(ids, descending, start_after, start_at, limit):
+    """Applies Firestore-style ordering and cursors to a sorted list of document IDs."""
+    ids = sorted(ids, reverse=descending)
+    if start_at is not None:
+        ids = [i for i in ids if (i <= start_at if descending else i >= start_at)]
+    if start_after is not None:
+        ids = [i for i in ids if (i < start_after if descending else i > start_after)]
+    return ids[:limit] if limit is not None else ids
+
+
+class WriteConflict(Exception):
+    """Raised by commit() when a create_doc() target already exists. Nothing in the batch was written."""
+
+
+# --- 1. IN-MEMORY BACKEND ---
+class MemoryStorage(StorageBackend):
+    """Dict-backed storage living inside the process. Data is lost when the process exits."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hunters = {}
+        self.docs = {}  # {(hunter, collection): {doc_id: data}}
+
+    def get_hunter(self, name):
+        with self._lock:
+            data = self.hunters.get(name)
+            return copy.deepcopy(data) if data is not None else None
+
+    def list_hunters(self):
+        with self._lock:
+            return sorted(self.hunters)
+
+    def get_hunters(self, names):
+        with self._lock:
+            return {name: copy.deepcopy(self.hunters.get(name)) for name in names}
+
+    def get_doc(self, name, collection, doc_id):
+        with self._lock:
+            data = self.docs.get((name, collection), {}).get(doc_id)
+            return copy.deepcopy(data) if data is not None else None
+
+    def get_docs(self, keys):
+        with self._lock:
+            return {key: copy.deepcopy(self.docs.get(key[:2], {}).get(key[2])) for key in keys}
+
+    def stream_docs(self, name, collection, descending=False, start_after=None, start_at=None, limit=None):
+        with self._lock:
+            docs = self.docs.get((name, collection), {})
+            ids = _select_ids(docs, descending, start_after, start_at, limit)
+            result = [(doc_id, copy.deepcopy(docs[doc_id])) for doc_id in ids]
+        return iter(result)
+
+    def _commit(self, ops):
+        with self._lock:
+            # Apply to copies of the touched documents first, so a failing op leaves nothing half-written
+            hunters, docs = {}, {}
+            for op, name, collection, doc_id, data, merge in ops:
+                if op == "set_hunter":
+                    hunters[name] = _merge({}, data)
+                else:
+                    key = (name, collection, doc_id)
+                    if key not in docs:
+                        docs[key] = copy.deepcopy(self.docs.get((name, collection), {}).get(doc_id))
+                    if op == "create_doc" and docs[key] is not None:
+                        raise WriteConflict(f"{name}/{collection}/{doc_id} already exists")
+                    docs[key] = _apply_doc_write(docs[key], data, merge)
+            self.hunters.update(hunters)
+            for (name, collection, doc_id), data in docs.items():
+                self.docs.setdefault((name, collection), {})[doc_id] = data
+
+
+# --- 2. SQLITE BACKEND ---
+class SQLiteStorage(StorageBackend):
+    """Embedded SQLite file in WAL mode. Documents are JSON, keyed by (hunter, collection, doc_id).
+
+    The (hunter, collection, doc_id) primary key is the (hunter, date) index for history,
+    so history range scans and cursors are index seeks.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS hunters ("
+        " name TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS documents ("
+        " hunter TEXT NOT NULL, collection TEXT NOT NULL, doc_id TEXT NOT NULL, data TEXT NOT NULL,"
+        " PRIMARY KEY (hunter, collection, doc_id)) WITHOUT ROWID",
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+
+    def _conn(self):
+        """One connection per thread (Streamlit serves sessions on separate threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _dumps(data):
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def get_hunter(self, name):
+        row = self._conn().execute("SELECT data FROM hunters WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_hunters(self):
+        return [name for (name,) in self._conn().execute("SELECT name FROM hunters ORDER BY name")]
+
+    def get_hunters(self, names):
+        names = list(dict.fromkeys(names))
+        found = {}
+        for start in range(0, len(names), GET_ALL_CHUNK):
+            chunk = names[start:start + GET_ALL_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn().execute(f"SELECT name, data FROM hunters WHERE name IN ({placeholders})", chunk)
+            found.update((name, json.loads(data)) for name, data in rows)
+        return {name: found.get(name) for name in names}
+
+    def get_doc(self, name, collection, doc_id):
+        row = self._conn().execute(
+            "SELECT data FROM documents WHERE hunter = ? AND collection = ? AND doc_id = ?",
+            (name, collection, doc_id),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_docs(self, keys):
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for start in range(0, len(keys), GET_ALL_CHUNK):
+            chunk = keys[start:start + GET_ALL_CHUNK]
+            placeholders = ",".join(["(?, ?, ?)"] * len(chunk))
+            # Joined from the VALUES list so each key is a primary-key seek (a row-value IN scans the table)
+            rows = self._conn().execute(
+                f"SELECT hunter, collection, doc_id, data FROM (VALUES {placeholders}) AS k"
+                " CROSS JOIN documents ON hunter = k.column1 AND collection = k.column2 AND doc_id = k.column3",
+                [part for key in chunk for part in key])
+            found.update(((name, collection, doc_id), json.loads(data)) for name, collection, doc_id, data in rows)
+        return {key: found.get(key) for key in keys}
+
+    def stream_docs(self, name, collection, descending=False, start_after=None, start_at=None, limit=None):
+        sql = "SELECT doc_id, data FROM documents WHERE hunter = ? AND collection = ?"
+        params = [name, collection]
+        if start_at is not None:
+            sql += " AND doc_id <= ?" if descending else " AND doc_id >= ?"
+            params.append(start_at)
+        if start_after is not None:
+            sql += " AND doc_id < ?" if descending else " AND doc_id > ?"
+            params.append(start_after)
+        sql += " ORDER BY doc_id DESC" if descending else " ORDER BY doc_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._conn().execute(sql, params).fetchall()
+        return ((doc_id, json.loads(data)) for doc_id, data in rows)
+
+    def _commit(self, ops):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for op, name, collection, doc_id, data, merge in ops:
+                if op == "set_hunter":
+                    conn.execute("INSERT OR REPLACE INTO hunters (name, data) VALUES (?, ?)",
+                                 (name, self._dumps(_merge({}, data))))
+                elif op == "create_doc":
+                    try:
+                        conn.execute("INSERT INTO documents (hunter, collection, doc_id, data) VALUES (?, ?, ?, ?)",
+                                     (name, collection, doc_id, self._dumps(_merge({}, data))))
+                    except sqlite3.IntegrityError:
+                        raise WriteConflict(f"{name}/{collection}/{doc_id} already exists") from None
+                else:
+                    current = None
+                    if merge:
+                        row = conn.execute(
+                            "SELECT data FROM documents WHERE hunter = ? AND collection = ? AND doc_id = ?",
+                            (name, collection, doc_id),
+                        ).fetchone()
+                        current = json.loads(row[0]) if row else None
+                    conn.execute(
+                        "INSERT OR REPLACE INTO documents (hunter, collection, doc_id, data) VALUES (?, ?, ?, ?)",
+                        (name, collection, doc_id, self._dumps(_apply_doc_write(current, data, merge))),
+                    )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+# --- 3. FIRESTORE BACKEND ---
+class FirestoreStorage(StorageBackend):
+    """Google Firestore, through an already-initialized firebase_admin client."""
+
+    def __init__(self, client):
+        from firebase_admin import firestore  # Imported lazily so local backends work without it
+        self._firestore = firestore
+        self.client = client
+
+    def _hunter_ref(self, name):
+        return self.client.collection("hunters").document(name)
+
+    def _translate(self, value):
+        if isinstance(value, Increment):
+            return self._firestore.Increment(value.amount)
+        if value is DELETE:
+            return self._firestore.DELETE_FIELD
+        if isinstance(value, dict):
+            return {k: self._translate(v) for k, v in value.items()}
+        return value
+
+    def get_hunter(self, name):
+        doc = self._hunter_ref(name).get()
+        return doc.to_dict() if doc.exists else None
+
+    def list_hunters(self):
+        # list_documents() returns references only, so no document bodies are read
+        return sorted(ref.id for ref in self.client.collection("hunters").list_documents())
+
+    def get_hunters(self, names):
+        names = list(dict.fromkeys(names))
+        found = {}
+        for start in range(0, len(names), GET_ALL_CHUNK):
+            refs = [self._hunter_ref(name) for name in names[start:start + GET_ALL_CHUNK]]
+            for doc in self.client.get_all(refs):
+                if doc.exists:
+                    found[doc.id] = doc.to_dict()
+        return {name: found.get(name) for name in names}
+
+    def get_doc(self, name, collection, doc_id):
+        doc = self._hunter_ref(name).collection(collection).document(doc_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def get_docs(self, keys):
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for start in range(0, len(keys), GET_ALL_CHUNK):
+            refs = {}
+            for key in keys[start:start + GET_ALL_CHUNK]:
+                name, collection, doc_id = key
+                refs[self._hunter_ref(name).collection(collection).document(doc_id).path] = key
+            for doc in self.client.get_all([self.client.document(path) for path in refs]):
+                if doc.exists:
+                    found[refs[doc.reference.path]] = doc.to_dict()
+        return {key: found.get(key) for key in keys}
+
+    def stream_docs(self, name, collection, descending=False, start_after=None, start_at=None, limit=None):
+        col_ref = self._hunter_ref(name).collection(collection)
+        direction = self._firestore.Query.DESCENDING if descending else self._firestore.Query.ASCENDING
+        query = col_ref.order_by("__name__", direction=direction)
+        if start_at is not None:
+            query = query.start_at({"__name__": col_ref.document(start_at)})
+        if start_after is not None:
+            query = query.start_after({"__name__": col_ref.document(start_after)})
+        if limit is not None:
+            query = query.limit(limit)
+        return ((doc.id, doc.to_dict()) for doc in query.stream())
+
+    def _commit(self, ops):
+        from google.api_core.exceptions import Conflict
+        # Firestore caps a batch at 500 writes. Splitting would lose atomicity, so callers keep under it.
+        if len(ops) > FIRESTORE_BATCH_LIMIT:
+            raise ValueError(f"{len(ops)} writes exceed one Firestore batch ({FIRESTORE_BATCH_LIMIT})")
+        batch = self.client.batch()
+        for op, name, collection, doc_id, data, merge in ops:
+            if op == "set_hunter":
+                batch.set(self._hunter_ref(name), self._translate(data))
+            elif op == "create_doc":
+                batch.create(self._hunter_ref(name).collection(collection).document(doc_id), self._translate(data))
+            else:
+                doc_ref = self._hunter_ref(name).collection(collection).document(doc_id)
+                batch.set(doc_ref, self._translate(data), merge=merge)
+        try:
+            batch.commit()
+        except Conflict as e: # AlreadyExists
+            raise WriteConflict(str(e)) from e
+
+
+# --- 4. CONFIGURATION ---
+def create_storage(kind=None, firestore_client_factory=None, sqlite_path=None):
+    """Builds the configured backend.
+
+    kind defaults to $SOLO_STORAGE_BACKEND ("firestore", "sqlite" or "memory"; default "firestore").
+    firestore_client_factory is only called for the Firestore backend.
+    """
+    kind = (kind or os.environ.get("SOLO_STORAGE_BACKEND") or "firestore").lower()
+    if kind == "firestore":
+        if firestore_client_factory is None:
+            raise ValueError("The Firestore backend needs a firestore_client_factory.")
+        client = firestore_client_factory()
+        if client is None:
+            return None
+        return FirestoreStorage(client)
+    if kind == "sqlite":
+        return SQLiteStorage(sqlite_path or os.environ.get("SOLO_SQLITE_PATH", "solo_leveling.db"))
+    if kind == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {kind!r}")